@@ -0,0 +1,263 @@
+import json
+import os
+import queue
+import threading
+import time
+import urllib.request
+from datetime import date
+
+from dotenv import load_dotenv
+
+from metrics import metrics
+from formatting import format_hit
+
+load_dotenv()
+
+# Twilio concatenates longer bodies, but rejects anything above 1600 characters.
+SMS_MAX_LENGTH = 1600
+SEND_RETRIES = 3
+RETRY_DELAY = 2.0
+QUEUE_SIZE = 100
+# How long a finishing run waits for queued alerts to go out.
+FLUSH_TIMEOUT = 60
+SENT_ALERTS_FILE = os.getenv('SENT_ALERTS_FILE', 'sent_alerts.json')
+
+
+class TwilioTransport:
+    def __init__(self, account_sid=None, auth_token=None, from_=None, to=None):
+        self.account_sid = account_sid or os.getenv('Account_SID')
+        self.auth_token = auth_token or os.getenv('Auth_Token')
+        self.from_ = from_ or os.getenv('Phone_nr')
+        self.to = to or os.getenv('My_Phone_nr')
+        self._client = None
+
+    @property
+    def client(self):
+        # twilio is only needed when an SMS is actually sent.
+        if self._client is None:
+            from twilio.rest import Client
+            self._client = Client(self.account_sid, self.auth_token)
+        return self._client
+
+    def send(self, body):
+        return self.client.messages.create(from_=self.from_, to=self.to, body=body).sid
+
+
+class FileTransport:
+    """Appends every message to a local file; handy for tests and dry runs."""
+
+    def __init__(self, path):
+        self.path = path
+
+    def send(self, body):
+        with open(self.path, 'a', encoding='utf-8') as alerts_file:
+            alerts_file.write(body + '\n\n')
+
+
+class HttpTransport:
+    """POSTs every message as JSON to a webhook."""
+
+    def __init__(self, url, timeout=10):
+        self.url = url
+        self.timeout = timeout
+
+    def send(self, body):
+        request = urllib.request.Request(self.url, data=json.dumps({'body': body}).encode('utf-8'),
+                                         headers={'Content-Type': 'application/json'})
+        with urllib.request.urlopen(request, timeout=self.timeout) as response:
+            return response.status
+
+
+def default_transport():
+    """Transport chosen by $ALERT_TRANSPORT: twilio (default), file or http."""
+    kind = os.getenv('ALERT_TRANSPORT', 'twilio')
+    if kind == 'file':
+        return FileTransport(os.getenv('ALERT_FILE', 'alerts.txt'))
+    if kind == 'http':
+        return HttpTransport(os.environ['ALERT_URL'])
+    return TwilioTransport()
+
+
+def split_message(lines, max_length=SMS_MAX_LENGTH):
+    """Pack whole lines into as few bodies of at most `max_length` characters as possible."""
+    bodies = []
+    current = ''
+    for line in lines:
+        while len(line) > max_length:
+            if current:
+                bodies.append(current)
+                current = ''
+            bodies.append(line[:max_length])
+            line = line[max_length:]
+        if current and len(current) + 1 + len(line) > max_length:
+            bodies.append(current)
+            current = ''
+        current = f"{current}\n{line}" if current else line
+    if current:
+        bodies.append(current)
+    return bodies
+
+
+class SentAlerts:
+    """Companies already alerted today, kept in a JSON file so a second run
+    on the same day does not repeat them."""
+
+    def __init__(self, path=SENT_ALERTS_FILE):
+        self.path = path
+        self.lock = threading.Lock()
+        self.day = None
+        # Delivered companies are written to the file; claimed ones only
+        # live in memory until their alert goes out.
+        self.companies = set()
+        self.pending = set()
+        if path and os.path.exists(path):
+            try:
+                with open(path, encoding='utf-8') as sent_file:
+                    stored = json.load(sent_file)
+                self.day = stored['date']
+                self.companies = set(stored['companies'])
+            except Exception as e:
+                print(f"Error while reading sent alerts: {str(e)}")
+
+    def _roll(self, today):
+        if self.day != today.isoformat():
+            self.day = today.isoformat()
+            self.companies = set()
+            self.pending = set()
+
+    def claim(self, names, today):
+        """Reserve the names not alerted or claimed yet today and return them."""
+        with self.lock:
+            self._roll(today)
+            new_names = [name for name in dict.fromkeys(names)
+                         if name not in self.companies and name not in self.pending]
+            self.pending.update(new_names)
+            return new_names
+
+    def release(self, names, today):
+        with self.lock:
+            if self.day == today.isoformat():
+                self.pending.difference_update(names)
+
+    def mark_sent(self, names, today):
+        """Record claimed names as delivered and write them to the file."""
+        with self.lock:
+            if self.day != today.isoformat():
+                return
+            self.pending.difference_update(names)
+            self.companies.update(names)
+        self.save()
+
+    def save(self):
+        if not self.path:
+            return
+        with self.lock:
+            stored = {'date': self.day, 'companies': sorted(self.companies)}
+        with open(self.path, 'w', encoding='utf-8') as sent_file:
+            json.dump(stored, sent_file)
+
+
+class AlertDispatcher:
+    """Sends hits from a background thread so slow or failing delivery never
+    blocks the caller.
+
+    Hits already alerted today are dropped, the rest are packed into bodies
+    of at most `max_length` characters and each body is retried with
+    backoff. Failed companies are released so a later run can retry them.
+    """
+
+    def __init__(self, transport, sent_alerts=None, max_length=SMS_MAX_LENGTH, retries=SEND_RETRIES,
+                 retry_delay=RETRY_DELAY, queue_size=QUEUE_SIZE):
+        self.transport = transport
+        self.sent_alerts = sent_alerts if sent_alerts is not None else SentAlerts()
+        self.max_length = max_length
+        self.retries = retries
+        self.retry_delay = retry_delay
+        self.queue = queue.Queue(maxsize=queue_size)
+        self.thread = None
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, exc_type, exc_value, traceback):
+        self.close()
+
+    def start(self):
+        if self.thread is None:
+            self.thread = threading.Thread(target=self._run, name='alert-dispatcher', daemon=True)
+            self.thread.start()
+
+    def notify(self, hits, today=None):
+        """Queue alerts for new hits and return the number of queued messages."""
+        today = today or date.today()
+        hits = list(hits.itertuples(index=False)) if hasattr(hits, 'itertuples') else list(hits)
+        new_names = set(self.sent_alerts.claim([hit.company_name for hit in hits], today))
+        new_hits = []
+        for hit in hits:
+            if hit.company_name in new_names:
+                new_hits.append(hit)
+                new_names.discard(hit.company_name)
+        if not new_hits:
+            return 0
+
+        # Bodies are cut on hit boundaries so every company lands in exactly one message.
+        lines = [format_hit(hit)[:self.max_length] for hit in new_hits]
+        bodies = split_message(lines, self.max_length)
+        names = [hit.company_name for hit in new_hits]
+        self.start()
+        queued = 0
+        for body in bodies:
+            line_count = body.count('\n') + 1
+            body_names, names = names[:line_count], names[line_count:]
+            try:
+                self.queue.put_nowait((body, body_names, today))
+                queued += 1
+            except queue.Full:
+                print(f"Alert queue is full, dropping alert for {len(body_names)} companies.")
+                self.sent_alerts.release(body_names, today)
+        return queued
+
+    def _run(self):
+        while True:
+            item = self.queue.get()
+            try:
+                if item is None:
+                    return
+                self._deliver(*item)
+            finally:
+                self.queue.task_done()
+
+    def _deliver(self, body, names, today):
+        for attempt in range(1, self.retries + 1):
+            try:
+                with metrics.timer('alert_send'):
+                    self.transport.send(body)
+                metrics.increment('alerts_sent')
+                break
+            except Exception as e:
+                print(f"Error while sending alert (attempt {attempt}/{self.retries}): {str(e)}")
+                metrics.increment('alert_send_errors')
+                if attempt < self.retries:
+                    time.sleep(self.retry_delay * 2 ** (attempt - 1))
+        else:
+            metrics.increment('alerts_failed')
+            self.sent_alerts.release(names, today)
+            return
+        try:
+            self.sent_alerts.mark_sent(names, today)
+        except Exception as e:
+            print(f"Error while saving sent alerts: {str(e)}")
+
+    def close(self, timeout=None):
+        """Flush queued alerts, waiting at most `timeout` seconds."""
+        if self.thread is None:
+            return
+        deadline = None if timeout is None else time.monotonic() + timeout
+        try:
+            self.queue.put(None, timeout=timeout)
+        except queue.Full:
+            pass
+        self.thread.join(None if deadline is None else max(0.0, deadline - time.monotonic()))
+        if self.thread.is_alive():
+            print("Alert delivery still in progress, giving up.")
+        self.thread = None
@@ -0,0 +1,80 @@
+import argparse
+import os
+import time
+from datetime import date, datetime
+
+from sqlalchemy import select
+
+from database import create_database_session, get_engine
+from metrics import write_metrics
+from models import ScrapeManifest, create_schema
+from page_cache import PageCache
+from pipeline import DONE, MIN_INTERVAL, FetchPipeline
+from trading_calendar import get_calendar
+
+
+def completed_dates(session, start_date, end_date):
+    query = select(ScrapeManifest.trade_date).where(
+        ScrapeManifest.status == DONE,
+        ScrapeManifest.trade_date.between(start_date, end_date),
+    )
+    return set(session.execute(query).scalars())
+
+
+def pending_sessions(session, start_date, end_date):
+    done = completed_dates(session, start_date, end_date)
+    return [day for day in get_calendar().sessions_between(start_date, end_date) if day not in done]
+
+
+def record_status(session, trade_date, status, rows=None, duration=None, error=None):
+    session.merge(ScrapeManifest(
+        trade_date=trade_date, status=status, rows=rows, duration=duration, error=error, updated_at=datetime.now()
+    ))
+    session.commit()
+
+
+def report_result(trade_date, status, rows, duration, error):
+    session = create_database_session()
+    record_status(session, trade_date, status, rows=rows, duration=duration, error=error)
+    session.close()
+    print(f"{trade_date}: {status}, {rows} rows in {duration:.1f}s ({rows / duration if duration else 0:.0f} rows/s)")
+
+
+def run_backfill(start_date, end_date, drivers=1, min_interval=MIN_INTERVAL, page_cache=None):
+    with get_engine().begin() as connection:
+        create_schema(connection)
+
+    session = create_database_session()
+    pending = pending_sessions(session, start_date, end_date)
+    session.close()
+    print(f"{len(pending)} sessions to fetch between {start_date} and {end_date}.")
+    if not pending:
+        return {}
+
+    started = time.perf_counter()
+    pipeline = FetchPipeline(workers=drivers, min_interval=min_interval, on_result=report_result, page_cache=page_cache)
+    results = pipeline.run(pending)
+    elapsed = time.perf_counter() - started
+
+    total_rows = sum(rows for _, rows, _ in results.values())
+    done = sum(1 for status, _, _ in results.values() if status == DONE)
+    print(f"Fetched {done}/{len(pending)} sessions, {total_rows} rows in {elapsed:.1f}s "
+          f"({total_rows / elapsed if elapsed else 0:.0f} rows/s, {elapsed / len(pending):.1f}s per date).")
+    write_metrics()
+    return results
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Backfill GPW quotes for a range of dates, resuming where the last run stopped")
+    parser.add_argument("--from", dest="start_date", type=date.fromisoformat, required=True, help="First date, YYYY-MM-DD")
+    parser.add_argument("--to", dest="end_date", type=date.fromisoformat, default=date.today(), help="Last date, YYYY-MM-DD (default: today)")
+    parser.add_argument("--drivers", type=int, default=1, help="Number of browsers fetching in parallel")
+    parser.add_argument("--min-interval", type=float, default=MIN_INTERVAL, help="Minimum seconds between page loads from money.pl")
+    parser.add_argument("--cache-dir", default=os.getenv('PAGE_CACHE_DIR'), help="Directory of cached raw pages (default: $PAGE_CACHE_DIR)")
+    args = parser.parse_args(argv)
+    page_cache = PageCache(args.cache_dir) if args.cache_dir else None
+    run_backfill(args.start_date, args.end_date, drivers=args.drivers, min_interval=args.min_interval, page_cache=page_cache)
+
+
+if __name__ == '__main__':
+    main()
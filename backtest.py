@@ -0,0 +1,144 @@
+import argparse
+import os
+from collections import namedtuple
+from concurrent.futures import ProcessPoolExecutor
+from itertools import product
+
+import numpy as np
+import pandas as pd
+
+from page_parser import VALUE_ADJUSTMENT
+from screener import SCREEN_DAYS, TRADING_VALUE_FILTER, pivot_quotes
+
+HORIZONS = (1, 5, 10)
+
+QuoteMatrix = namedtuple('QuoteMatrix', ['companies', 'trade_dates', 'arrays'])
+
+
+def build_matrix(frame):
+    """Companies x sessions arrays of the whole history, aligned by company."""
+    return QuoteMatrix(*pivot_quotes(frame))
+
+
+def trailing_all(mask, window):
+    # True where the last `window` sessions up to and including this one
+    # are all True, computed with one cumulative sum over the date axis.
+    counts = np.cumsum(mask, axis=1, dtype=np.int32)
+    windowed = counts.copy()
+    windowed[:, window:] -= counts[:, :-window]
+    windowed[:, :window - 1] = 0
+    return windowed == window
+
+
+def signals(matrix, days=SCREEN_DAYS, value_adjustment=VALUE_ADJUSTMENT, trading_value_filter=TRADING_VALUE_FILTER):
+    arrays = matrix.arrays
+    with np.errstate(invalid='ignore'):
+        growing = arrays['value_change'] > 0
+        liquid = arrays['trading_value'] > trading_value_filter
+        # max_value is stored already scaled by VALUE_ADJUSTMENT.
+        breakout = arrays['end_day_value'] >= arrays['max_value'] * (value_adjustment / VALUE_ADJUSTMENT)
+    return trailing_all(growing & liquid, days) & breakout
+
+
+def forward_returns(close, horizon):
+    returns = np.full(close.shape, np.nan)
+    with np.errstate(invalid='ignore', divide='ignore'):
+        returns[:, :-horizon] = close[:, horizon:] / close[:, :-horizon] - 1
+    return returns
+
+
+def horizon_returns(matrix, horizons=HORIZONS):
+    close = matrix.arrays['end_day_value']
+    return {horizon: forward_returns(close, horizon) for horizon in horizons}
+
+
+def evaluate(matrix, days=SCREEN_DAYS, value_adjustment=VALUE_ADJUSTMENT, trading_value_filter=TRADING_VALUE_FILTER,
+             horizons=HORIZONS, returns=None):
+    signal = signals(matrix, days, value_adjustment, trading_value_filter)
+    returns = returns or horizon_returns(matrix, horizons)
+    result = {
+        'days': days,
+        'value_adjustment': value_adjustment,
+        'trading_value_filter': trading_value_filter,
+        'signals': int(signal.sum()),
+    }
+    for horizon in horizons:
+        realized = returns[horizon][signal]
+        realized = realized[~np.isnan(realized)]
+        result[f'mean_return_{horizon}d'] = realized.mean() if realized.size else np.nan
+        result[f'hit_rate_{horizon}d'] = (realized > 0).mean() if realized.size else np.nan
+    return result
+
+
+def signal_events(matrix, days=SCREEN_DAYS, value_adjustment=VALUE_ADJUSTMENT, trading_value_filter=TRADING_VALUE_FILTER,
+                  horizons=HORIZONS):
+    """Every historical hit with its forward returns, one row per signal."""
+    signal = signals(matrix, days, value_adjustment, trading_value_filter)
+    company_index, date_index = np.nonzero(signal)
+    events = pd.DataFrame({
+        'trade_date': np.asarray(matrix.trade_dates, dtype=object)[date_index],
+        'company_name': matrix.companies[company_index],
+        'end_day_value': matrix.arrays['end_day_value'][company_index, date_index],
+    })
+    close = matrix.arrays['end_day_value']
+    for horizon in horizons:
+        events[f'return_{horizon}d'] = forward_returns(close, horizon)[company_index, date_index]
+    return events.sort_values(['trade_date', 'company_name'], kind='stable').reset_index(drop=True)
+
+
+def parameter_grid(days=(SCREEN_DAYS,), value_adjustments=(VALUE_ADJUSTMENT,), trading_value_filters=(TRADING_VALUE_FILTER,)):
+    return [
+        {'days': window, 'value_adjustment': adjustment, 'trading_value_filter': value_filter}
+        for window, adjustment, value_filter in product(days, value_adjustments, trading_value_filters)
+    ]
+
+
+# Each worker process receives the matrix and its forward returns once
+# instead of once per setting.
+_worker_state = None
+
+
+def _init_worker(matrix, horizons):
+    global _worker_state
+    _worker_state = matrix, horizons, horizon_returns(matrix, horizons)
+
+
+def _evaluate_parameters(parameters):
+    matrix, horizons, returns = _worker_state
+    return evaluate(matrix, horizons=horizons, returns=returns, **parameters)
+
+
+def sweep(matrix, grid, horizons=HORIZONS, workers=None):
+    """Evaluate every grid setting, fanning out over processes when there are several cores."""
+    workers = workers or os.cpu_count() or 1
+    if workers == 1 or len(grid) == 1:
+        returns = horizon_returns(matrix, horizons)
+        results = [evaluate(matrix, horizons=horizons, returns=returns, **parameters) for parameters in grid]
+    else:
+        chunksize = max(1, len(grid) // (workers * 4))
+        with ProcessPoolExecutor(max_workers=workers, initializer=_init_worker, initargs=(matrix, horizons)) as executor:
+            results = list(executor.map(_evaluate_parameters, grid, chunksize=chunksize))
+    return pd.DataFrame(results)
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Backtest the momentum screen over the Parquet quote archive")
+    parser.add_argument("--dir", dest="directory", default=None, help="Archive directory (default: $QUOTES_ARCHIVE_DIR or quotes_archive)")
+    parser.add_argument("--days", type=int, nargs='+', default=[SCREEN_DAYS], help="Growth windows to test")
+    parser.add_argument("--value-adjustment", type=float, nargs='+', default=[VALUE_ADJUSTMENT], help="Fractions of the daily max to test")
+    parser.add_argument("--trading-value-filter", type=int, nargs='+', default=[TRADING_VALUE_FILTER], help="Minimum trading values to test")
+    parser.add_argument("--horizons", type=int, nargs='+', default=list(HORIZONS), help="Forward return horizons in sessions")
+    parser.add_argument("--workers", type=int, default=None, help="Worker processes (default: all cores)")
+    args = parser.parse_args(argv)
+
+    # pyarrow is only needed to read the archive, not to evaluate a matrix.
+    from columnar_store import ARCHIVE_DIR, read_quotes_frame
+    matrix = build_matrix(read_quotes_frame(args.directory or ARCHIVE_DIR))
+    grid = parameter_grid(args.days, args.value_adjustment, args.trading_value_filter)
+    results = sweep(matrix, grid, horizons=args.horizons, workers=args.workers)
+    print(f"{len(matrix.companies)} companies x {len(matrix.trade_dates)} sessions, {len(grid)} settings")
+    print(results.to_string(index=False))
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,200 @@
+import argparse
+import json
+import os
+import platform
+import time
+import tracemalloc
+from collections import namedtuple
+from functools import lru_cache
+
+from sqlalchemy import create_engine, insert
+from sqlalchemy.orm import sessionmaker
+
+from backtest import build_matrix, evaluate
+from benchmarks.synthetic import HISTORY_END, synthetic_history
+from downloader import store_rows
+from models import Base, Quote
+from page_parser import QUOTE_COLUMNS, extract_table_cells, normalize_row, parse_quotes_html
+from quote_store import QuoteStore
+from screener import SCREEN_DAYS, screen, screen_in_database
+from trading_calendar import get_calendar
+
+BENCHMARK_DIR = os.path.dirname(os.path.abspath(__file__))
+FIXTURE = os.path.join(os.path.dirname(BENCHMARK_DIR), 'NotowaniaGPW.htm')
+BASELINE = os.path.join(BENCHMARK_DIR, 'baseline.json')
+# A stage regresses when it is this much slower, or uses this much more
+# memory, than the baseline. Stages of a few milliseconds jitter by 20-30%
+# between runs on a shared machine.
+TOLERANCE = 0.5
+
+# setup() runs untimed before every repetition and returns the input of
+# run(), which returns the number of rows it processed.
+Stage = namedtuple('Stage', ['name', 'setup', 'run'])
+
+
+def measure(stage, repeat=5):
+    """Best-of-`repeat` wall time plus the peak traced memory of one extra run."""
+    timings = []
+    for _ in range(repeat):
+        state = stage.setup()
+        started = time.perf_counter()
+        rows = stage.run(state)
+        timings.append(time.perf_counter() - started)
+
+    state = stage.setup()
+    tracemalloc.start()
+    try:
+        stage.run(state)
+        _, peak = tracemalloc.get_traced_memory()
+    finally:
+        tracemalloc.stop()
+
+    seconds = min(timings)
+    return {
+        'seconds': seconds,
+        'rows': rows,
+        'rows_per_second': rows / seconds if seconds else float('inf'),
+        'peak_kib': peak / 1024,
+    }
+
+
+def new_session(database_url):
+    engine = create_engine(database_url)
+    if engine.dialect.name != 'sqlite':
+        # A persistent database is emptied so every repetition inserts into
+        # a fresh table, as the first download of a day does.
+        Base.metadata.drop_all(engine)
+    return sessionmaker(bind=engine)()
+
+
+def build_stages(companies=400, sessions=750, insert_days=20, database_url='sqlite://'):
+    with open(FIXTURE, encoding='utf-8') as html_file:
+        html = html_file.read()
+    cells = extract_table_cells(html)
+    page_rows = parse_quotes_html(html)
+    insert_dates = get_calendar().previous_sessions(insert_days, until=HISTORY_END)
+
+    history = synthetic_history(companies, sessions)
+    recent = history[history['trade_date'].isin(sorted(history['trade_date'].unique())[-SCREEN_DAYS:])]
+    matrix = build_matrix(history)
+    store = QuoteStore.from_frame(history)
+
+    # Loading the history into SQLite takes seconds, so it only happens
+    # when the database screen is actually run.
+    @lru_cache(maxsize=None)
+    def stored_history():
+        session = sessionmaker(bind=create_engine('sqlite://'))()
+        Base.metadata.create_all(session.bind)
+        session.execute(insert(Quote), history.to_dict('records'))
+        session.commit()
+        return session
+
+    def store_days(session):
+        stored = sum(store_rows(session, trade_date, page_rows) for trade_date in insert_dates)
+        session.close()
+        return stored
+
+    # The screens report the rows they scan, not the handful of hits.
+    def screen_recent(frame):
+        screen(frame)
+        return len(frame)
+
+    def screen_stored(session):
+        screen_in_database(session, until=HISTORY_END)
+        return len(recent)
+
+    def screen_store(quotes):
+        quotes.screen()
+        return len(recent)
+
+    def evaluate_history(quotes):
+        evaluate(quotes)
+        return len(history)
+
+    return [
+        Stage('extract_cells', lambda: html, lambda page: len(extract_table_cells(page))),
+        Stage('normalize_rows', lambda: cells,
+              lambda page_cells: len([normalize_row([row[column] for column in QUOTE_COLUMNS]) for row in page_cells])),
+        Stage('parse_page', lambda: html, lambda page: len(parse_quotes_html(page))),
+        Stage('store_rows', lambda: new_session(database_url), store_days),
+        Stage('screen_frame', lambda: recent, screen_recent),
+        Stage('screen_database', stored_history, screen_stored),
+        Stage('screen_store', lambda: store, screen_store),
+        Stage('backtest_evaluate', lambda: matrix, evaluate_history),
+    ]
+
+
+def compare(results, baseline, tolerance=TOLERANCE):
+    """Stages whose time or peak memory grew by more than `tolerance`."""
+    regressions = []
+    for name, result in results.items():
+        if name not in baseline:
+            continue
+        for metric in ('seconds', 'peak_kib'):
+            before, after = baseline[name][metric], result[metric]
+            if before and after > before * (1 + tolerance):
+                regressions.append(f"{name}: {metric} {before:.4g} -> {after:.4g} ({after / before - 1:+.0%})")
+    return regressions
+
+
+def format_report(results, baseline=None):
+    lines = [f"{'stage':18} {'best ms':>10} {'rows':>8} {'rows/s':>12} {'peak KiB':>10} {'vs baseline':>12}"]
+    for name, result in results.items():
+        change = ''
+        if baseline and name in baseline and baseline[name]['seconds']:
+            change = f"{result['seconds'] / baseline[name]['seconds'] - 1:+.0%}"
+        lines.append(f"{name:18} {result['seconds'] * 1000:10.2f} {result['rows']:8d} "
+                     f"{result['rows_per_second']:12,.0f} {result['peak_kib']:10,.0f} {change:>12}")
+    return '\n'.join(lines)
+
+
+def load_baseline(path):
+    if not os.path.exists(path):
+        return None
+    with open(path, encoding='utf-8') as baseline_file:
+        return json.load(baseline_file)['stages']
+
+
+def save_baseline(path, results):
+    with open(path, 'w', encoding='utf-8') as baseline_file:
+        json.dump({'python': platform.python_version(), 'machine': platform.machine(), 'stages': results},
+                  baseline_file, indent=2, sort_keys=True)
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Time the parse, store and screen stages")
+    parser.add_argument("--repeat", type=int, default=5, help="Timed repetitions per stage (best is reported)")
+    parser.add_argument("--companies", type=int, default=400, help="Companies in the synthetic history")
+    parser.add_argument("--sessions", type=int, default=750, help="Sessions in the synthetic history")
+    parser.add_argument("--insert-days", type=int, default=20, help="Days of fixture rows stored per repetition")
+    parser.add_argument("--database-url", default=os.getenv('BENCHMARK_DATABASE_URL', 'sqlite://'),
+                        help="Database for the store stage; its tables are dropped (default: in-memory SQLite)")
+    parser.add_argument("--stage", action='append', help="Run only these stages")
+    parser.add_argument("--baseline", default=BASELINE, help="Baseline JSON to compare against")
+    parser.add_argument("--save-baseline", action='store_true', help="Write the results as the new baseline")
+    parser.add_argument("--tolerance", type=float, default=TOLERANCE, help="Allowed slowdown before failing")
+    parser.add_argument("--output", help="Also write the report to this file")
+    args = parser.parse_args(argv)
+
+    stages = build_stages(args.companies, args.sessions, args.insert_days, args.database_url)
+    results = {stage.name: measure(stage, args.repeat) for stage in stages if not args.stage or stage.name in args.stage}
+
+    baseline = load_baseline(args.baseline)
+    report = format_report(results, baseline)
+    regressions = compare(results, baseline, args.tolerance) if baseline else []
+    if regressions:
+        report += '\n\nRegressions:\n' + '\n'.join(regressions)
+    print(report)
+    if args.output:
+        with open(args.output, 'w', encoding='utf-8') as output_file:
+            output_file.write(report + '\n')
+
+    if args.save_baseline:
+        save_baseline(args.baseline, results)
+        print(f"Baseline written to {args.baseline}.")
+    elif regressions:
+        raise SystemExit(1)
+
+
+if __name__ == '__main__':
+    main()
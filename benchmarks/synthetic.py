@@ -0,0 +1,31 @@
+from datetime import date
+
+import numpy as np
+import pandas as pd
+
+from page_parser import VALUE_ADJUSTMENT
+from trading_calendar import get_calendar
+
+HISTORY_END = date(2024, 2, 23)
+
+
+def synthetic_history(companies=400, sessions=750, seed=0, end=HISTORY_END):
+    """A reproducible quotes frame shaped like the `quotes` table: random
+    walk closes, a daily max slightly above the close and uniform trading
+    values, one row per company and GPW session."""
+    trade_dates = get_calendar().previous_sessions(sessions, until=end)
+    rng = np.random.default_rng(seed)
+    shape = (companies, len(trade_dates))
+    value_change = rng.normal(0.05, 2.0, shape).round(2)
+    end_day_value = (50 * np.cumprod(1 + value_change / 100, axis=1)).round(2)
+    max_value = (end_day_value * rng.uniform(1.0, 1.03, shape) * VALUE_ADJUSTMENT).round(2)
+    trading_value = rng.integers(0, 2000000, shape)
+    names = [f"Company {i:04d}" for i in range(companies)]
+    return pd.DataFrame({
+        'trade_date': np.tile(np.array(trade_dates, dtype=object), companies),
+        'company_name': np.repeat(names, len(trade_dates)),
+        'value_change': value_change.ravel(),
+        'end_day_value': end_day_value.ravel(),
+        'trading_value': trading_value.ravel(),
+        'max_value': max_value.ravel(),
+    })
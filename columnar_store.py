@@ -0,0 +1,127 @@
+import argparse
+import glob
+import os
+from datetime import date, timedelta
+
+import pyarrow as pa
+import pyarrow.compute as pc
+import pyarrow.parquet as pq
+
+from sqlalchemy import select
+
+from database import create_database_session
+from models import Quote, partition_name
+from screener import QUOTE_FIELDS, SCREEN_DAYS, TRADING_VALUE_FILTER, screen
+
+ARCHIVE_DIR = os.getenv('QUOTES_ARCHIVE_DIR', 'quotes_archive')
+
+QUOTE_SCHEMA = pa.schema([
+    ('trade_date', pa.date32()),
+    ('company_name', pa.string()),
+    ('value_change', pa.float64()),
+    ('end_day_value', pa.float64()),
+    ('trading_value', pa.int64()),
+    ('max_value', pa.float64()),
+])
+
+
+def month_start(day):
+    return day.replace(day=1)
+
+
+def next_month(day):
+    return (month_start(day) + timedelta(days=32)).replace(day=1)
+
+
+def month_path(directory, day):
+    # One file per month, named like the PostgreSQL partition it mirrors.
+    return os.path.join(directory, f"{partition_name(day)}.parquet")
+
+
+def export_month(session, directory, day):
+    start, end = month_start(day), next_month(day)
+    query = select(Quote.trade_date, Quote.company_name, *[getattr(Quote, field) for field in QUOTE_FIELDS]).where(
+        Quote.trade_date >= start, Quote.trade_date < end).order_by(Quote.trade_date, Quote.company_name)
+    rows = session.execute(query).all()
+    if not rows:
+        return None
+
+    columns = list(zip(*rows))
+    table = pa.table({name: pa.array(column, type=QUOTE_SCHEMA.field(name).type)
+                      for name, column in zip(QUOTE_SCHEMA.names, columns)}, schema=QUOTE_SCHEMA)
+    os.makedirs(directory, exist_ok=True)
+    path = month_path(directory, day)
+    temporary_path = f"{path}.tmp"
+    pq.write_table(table, temporary_path, compression='zstd')
+    os.replace(temporary_path, path)
+    return path
+
+
+def export_range(session, directory, start_date, end_date):
+    paths = []
+    day = month_start(start_date)
+    while day <= end_date:
+        path = export_month(session, directory, day)
+        if path:
+            print(f"Exported {path}.")
+            paths.append(path)
+        day = next_month(day)
+    return paths
+
+
+def archive_paths(directory, start_date=None, end_date=None):
+    paths = sorted(glob.glob(os.path.join(directory, f"{Quote.__tablename__}_*.parquet")))
+    if start_date:
+        paths = [path for path in paths if path >= month_path(directory, start_date)]
+    if end_date:
+        paths = [path for path in paths if path <= month_path(directory, end_date)]
+    return paths
+
+
+def read_quotes(directory, start_date=None, end_date=None, columns=None):
+    """Memory-maps the monthly files covering the range into one Arrow table."""
+    filters = []
+    if start_date:
+        filters.append(('trade_date', '>=', start_date))
+    if end_date:
+        filters.append(('trade_date', '<=', end_date))
+    tables = [pq.read_table(path, columns=columns, memory_map=True, filters=filters or None)
+              for path in archive_paths(directory, start_date, end_date)]
+    if not tables:
+        return QUOTE_SCHEMA.empty_table() if columns is None else QUOTE_SCHEMA.empty_table().select(columns)
+    return pa.concat_tables(tables)
+
+
+def read_quotes_frame(directory, start_date=None, end_date=None):
+    return read_quotes(directory, start_date, end_date).to_pandas(split_blocks=True, self_destruct=True)
+
+
+def archive_trade_dates(directory, until=None):
+    trade_dates = read_quotes(directory, end_date=until, columns=['trade_date'])['trade_date']
+    return sorted(pc.unique(trade_dates).to_pylist())
+
+
+def screen_archive(directory, days=SCREEN_DAYS, trading_value_filter=TRADING_VALUE_FILTER, until=None):
+    trade_dates = archive_trade_dates(directory, until)[-days:]
+    if trade_dates:
+        frame = read_quotes_frame(directory, trade_dates[0], trade_dates[-1])
+    else:
+        frame = QUOTE_SCHEMA.empty_table().to_pandas()
+    return screen(frame, days=days, trading_value_filter=trading_value_filter)
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Export stored quotes to monthly Parquet files")
+    parser.add_argument("--from", dest="start_date", type=date.fromisoformat, required=True, help="First date, YYYY-MM-DD")
+    parser.add_argument("--to", dest="end_date", type=date.fromisoformat, default=date.today(), help="Last date, YYYY-MM-DD (default: today)")
+    parser.add_argument("--dir", dest="directory", default=ARCHIVE_DIR, help="Output directory (default: $QUOTES_ARCHIVE_DIR or quotes_archive)")
+    args = parser.parse_args(argv)
+
+    session = create_database_session()
+    paths = export_range(session, args.directory, args.start_date, args.end_date)
+    session.close()
+    print(f"Exported {len(paths)} months to {args.directory}.")
+
+
+if __name__ == '__main__':
+    main()
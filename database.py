@@ -0,0 +1,52 @@
+import os
+from functools import lru_cache
+
+from dotenv import load_dotenv
+
+from sqlalchemy import create_engine, exc
+from sqlalchemy.orm import sessionmaker, scoped_session
+
+load_dotenv()
+
+POOL_SIZE = int(os.getenv('POSTGRES_POOL_SIZE', 5))
+MAX_OVERFLOW = int(os.getenv('POSTGRES_MAX_OVERFLOW', 5))
+POOL_RECYCLE = int(os.getenv('POSTGRES_POOL_RECYCLE', 1800))
+
+
+def database_url():
+    postgres_username = os.environ['POSTGRES_USERNAME']
+    postgres_password = os.environ.get('POSTGRES_PASSWORD')
+    postgres_host = os.environ['POSTGRES_HOST']
+    postgres_dbname = os.environ['POSTGRES_DB']
+    return f'postgresql://{postgres_username}:{postgres_password}@{postgres_host}/{postgres_dbname}'
+
+
+@lru_cache(maxsize=None)
+def get_engine():
+    # One pooled engine per process; the existence check runs only once.
+    from sqlalchemy_utils import database_exists, create_database
+    postgres_engine = create_engine(
+        database_url(),
+        pool_size=POOL_SIZE,
+        max_overflow=MAX_OVERFLOW,
+        pool_recycle=POOL_RECYCLE,
+        pool_pre_ping=True,
+    )
+
+    if not database_exists(postgres_engine.url):
+        try:
+            create_database(postgres_engine.url)
+        except exc.DatabaseError as e:
+            print(f"Error while creating database: {e}")
+            exit(1)
+
+    return postgres_engine
+
+
+@lru_cache(maxsize=None)
+def get_session_factory():
+    return scoped_session(sessionmaker(bind=get_engine()))
+
+
+def create_database_session():
+    return get_session_factory()()
@@ -1,182 +1,474 @@
-import os
+import argparse
+import queue
+import threading
 import time
-from datetime import datetime
+import weakref
+from contextlib import contextmanager
+from datetime import date, datetime
 
 from dotenv import load_dotenv
 
-from selenium import webdriver
-from selenium.webdriver.common.by import By
-from selenium.webdriver.support.ui import WebDriverWait
-from selenium.webdriver.support import expected_conditions as EC
-from selenium.common.exceptions import StaleElementReferenceException
+from sqlalchemy import inspect, insert
 
-from sqlalchemy import create_engine, inspect, Column, String, Integer, Float, exc
-from sqlalchemy.orm import declarative_base, sessionmaker, scoped_session
-from sqlalchemy_utils import database_exists, create_database
+from database import create_database_session
+from metrics import log_event, metrics, write_metrics
+from models import Quote, create_schema, ensure_partition
+from page_cache import default_page_cache
+from page_parser import normalize_row, parse_quotes_page
+from trading_calendar import get_calendar
 
 load_dotenv()
 
-VALUE_ADJUSTMENT = 0.95
+QUOTES_URL = 'https://www.money.pl/gielda/gpw/akcje/?date={date}'
+ACCEPT_COOKIE_BUTTON = "/html/body/div[3]/div/div[2]/div[3]/div/button[2]"
 
+COOKIE_TIMEOUT = 5
+TABLE_TIMEOUT = 10
+TABLE_POLL_FREQUENCY = 0.25
+MAX_STALE_RETRIES = 3
 
+# Engines already known to hold the quotes table. Tables are never dropped
+# during a run, so the schema is inspected once per engine instead of once
+# per date.
+_engines_with_quotes = weakref.WeakSet()
+_engines_lock = threading.Lock()
+
+# Pulls the whole quotes table in a single WebDriver round trip. Cell order
+# matches QUOTE_COLUMNS and the nth-child selectors of the per-row fallback.
+QUOTES_TABLE_SCRIPT = """
+return Array.from(document.querySelectorAll('div.rt-tr-group')).map(function (group) {
+    var cells = group.querySelectorAll('div.rt-tr > div.rt-td');
+    var text = function (index) {
+        return cells.length > index ? cells[index].textContent.trim() : null;
+    };
+    return [text(0), text(2), text(1), text(7), text(5)];
+});
+"""
+
+QUOTES_TABLE_STATE_SCRIPT = """
+var groups = document.querySelectorAll('div.rt-tr-group');
+var populated = Array.from(groups).filter(function (group) {
+    return group.querySelector('div.rt-td') !== null && group.textContent.trim() !== '';
+}).length;
+return [groups.length, populated];
+"""
+
+
+class IncompleteTableError(Exception):
+    """Fewer rows were read than the quotes table holds."""
+
+
+def parse_date(chosen_date):
+    for date_format in ("%Y-%m-%d", "%Y_%m_%d"):
+        try:
+            return datetime.strptime(chosen_date, date_format)
+        except (TypeError, ValueError):
+            pass
+    print("Error while parsing date")
+    return None
+
+
+class quotes_table_ready:
+    """Wait condition that holds once the quotes table has stopped growing
+    and every row has text; returns the row count."""
 
-class StockDataRetriever:
     def __init__(self):
-        options = webdriver.ChromeOptions()
-        options.add_argument("--disable-notifications")
-        options.add_argument('--ignore-ssl-errors=yes')
-        options.add_argument('--ignore-certificate-errors')
-        options.add_argument('--headless')
-        options.add_argument('--log-level=3')
-        self.driver = webdriver.Chrome(options=options)
-    
+        self.last_count = None
+
+    def __call__(self, driver):
+        count, populated = driver.execute_script(QUOTES_TABLE_STATE_SCRIPT)
+        stable = count > 0 and populated == count and count == self.last_count
+        self.last_count = count
+        return count if stable else False
+
+
+class StockDataRetriever:
+    def __init__(self, bulk_extraction=True, rate_limiter=None, page_cache=None):
+        self.bulk_extraction = bulk_extraction
+        self.rate_limiter = rate_limiter
+        self.page_cache = page_cache
+        self._driver = None
+        self.cookies_accepted = False
+
+    @property
+    def driver(self):
+        # Chrome only starts when a page is not in the cache, and selenium is
+        # only imported when Chrome starts.
+        if self._driver is None:
+            from selenium import webdriver
+            options = webdriver.ChromeOptions()
+            options.add_argument("--disable-notifications")
+            options.add_argument('--ignore-ssl-errors=yes')
+            options.add_argument('--ignore-certificate-errors')
+            options.add_argument('--headless')
+            options.add_argument('--log-level=3')
+            self._driver = webdriver.Chrome(options=options)
+        return self._driver
+
+    def start(self):
+        return self.driver
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, exc_type, exc_value, traceback):
+        self.close()
+
+    def close(self):
+        if self._driver is not None:
+            self._driver.quit()
+            self._driver = None
+            self.cookies_accepted = False
+
     def parse_date(self, chosen_date):
-        try:
-            parsed_date = datetime.strptime(chosen_date, "%Y-%m-%d")
-            # self.driver.get(url)
-        except ValueError:
-            parsed_date = datetime.strptime(chosen_date, "%Y_%m_%d")
-            # self.driver.get(url)
-        except:
-            print(f"Error while parsing date")
-            return None
-        return parsed_date
-    
+        return parse_date(chosen_date)
+
     def accept_cookies(self):
-        accept_cookie_button = "/html/body/div[3]/div/div[2]/div[3]/div/button[2]"
+        # The consent cookie lives in the browser profile, so a warm driver
+        # only has to click the banner on its first page load.
+        if self.cookies_accepted:
+            return
+        from selenium.webdriver.common.by import By
+        from selenium.webdriver.support import expected_conditions as EC
+        from selenium.webdriver.support.ui import WebDriverWait
         try:
-            cookie_button = WebDriverWait(self.driver, 5).until(
-                EC.element_to_be_clickable((By.XPATH, accept_cookie_button))
-            )
-            cookie_button.click()
+            # Stop waiting as soon as either the banner or the quotes table
+            # shows up; a page without a banner costs no timeout.
+            with metrics.timer('wait_cookies'):
+                WebDriverWait(self.driver, COOKIE_TIMEOUT).until(EC.any_of(
+                    EC.element_to_be_clickable((By.XPATH, ACCEPT_COOKIE_BUTTON)),
+                    EC.presence_of_element_located((By.CSS_SELECTOR, "div.rt-tr-group")),
+                ))
+            cookie_buttons = self.driver.find_elements(By.XPATH, ACCEPT_COOKIE_BUTTON)
+            if cookie_buttons:
+                cookie_buttons[0].click()
+                self.cookies_accepted = True
         except Exception as e:
             print(f"Error while accepting cookie files: {e}")
-    
+
+    def wait_for_quotes_table(self, timeout=TABLE_TIMEOUT):
+        from selenium.webdriver.support.ui import WebDriverWait
+        with metrics.timer('wait_table'):
+            return WebDriverWait(self.driver, timeout, poll_frequency=TABLE_POLL_FREQUENCY).until(quotes_table_ready())
+
     def create_database_session(self):
-        postgres_username = os.environ['POSTGRES_USERNAME']
-        postgres_password = os.environ.get('POSTGRES_PASSWORD')
-        postgres_host = os.environ['POSTGRES_HOST']
-        postgres_dbname = os.environ['POSTGRES_DB']
-        
-        postgres_engine = create_engine(f'postgresql://{postgres_username}:{postgres_password}@{postgres_host}/{postgres_dbname}')
-        
-        if not database_exists(postgres_engine.url):
+        return create_database_session()
+
+    # Every extractor returns the parsed rows and the number of rows it read
+    # but could not parse, so a bad cell is not mistaken for a missing row
+    # and is counted once, by the pass whose rows are used.
+    def extract_rows_bulk(self):
+        table = self.driver.execute_script(QUOTES_TABLE_SCRIPT)
+        rows = []
+        unparsed = 0
+        for i, cells in enumerate(table, start=1):
+            try:
+                rows.append(normalize_row(cells))
+            except Exception as e:
+                print(f"Error while retrieving from div {i}: {str(e)}")
+                unparsed += 1
+        return rows, unparsed
+
+    def extract_rows_from_page_source(self):
+        return parse_quotes_page(self.driver.page_source)
+
+    def extract_rows_per_row(self, number_of_elements):
+        from selenium.common.exceptions import StaleElementReferenceException
+        from selenium.webdriver.common.by import By
+        rows = []
+        unparsed = 0
+        i = 0
+        retries = 0
+
+        while i < number_of_elements:
+            i += 1
+
+            company_names = f"div.rt-tr-group:nth-child({i}) > div:nth-child(1) > div:nth-child(1) > a:nth-child(1) > div:nth-child(1)"
+            value_change = f"div.rt-tr-group:nth-child({i}) > div:nth-child(1) > div:nth-child(3) > div:nth-child(1)"
+            end_day_value = f"div.rt-tr-group:nth-child({i}) > div:nth-child(1) > div:nth-child(2) > div:nth-child(1)"
+            trading_amount = f"div.rt-tr-group:nth-child({i}) > div:nth-child(1) > div:nth-child(8) > div:nth-child(1)"
+            max_value = f"div.rt-tr-group:nth-child({i}) > div:nth-child(1) > div:nth-child(6) > div:nth-child(1)"
+
+            elements_list = [company_names, value_change, end_day_value, trading_amount, max_value]
+
+            cells = None
             try:
-                create_database(postgres_engine.url)
-            except exc.DatabaseError as e:
-                print(f"Error while creating database: {e}")
-                exit(1)
-            
-        Session = scoped_session(sessionmaker(bind=postgres_engine))
-        return Session()
+                # The table is already fully rendered, so the cells can be
+                # read directly instead of waiting on each one.
+                elements = [self.driver.find_element(By.CSS_SELECTOR, element) for element in elements_list]
+                cells = [element.text for element in elements]
+
+            except StaleElementReferenceException:
+                # A row that keeps going stale is given up on instead of
+                # being retried forever.
+                metrics.increment('stale_retries')
+                if retries < MAX_STALE_RETRIES:
+                    retries += 1
+                    print(f"Error while retrieving from div {i}: Element is stale, retry {retries}/{MAX_STALE_RETRIES}")
+                    i -= 1
+                    continue
+                print(f"Error while retrieving from div {i}: Element is still stale, skipping row")
+
+            except Exception as e:
+                print(f"Error while retrieving from div {i}: {str(e)}")
+            retries = 0
+
+            if cells is not None:
+                try:
+                    rows.append(normalize_row(cells))
+                except Exception as e:
+                    print(f"Error while retrieving from div {i}: {str(e)}")
+                    unparsed += 1
+        return rows, unparsed
+
+    def fetch_rows(self, chosen_date, use_cache=True):
+        started = time.perf_counter()
+        rows, unparsed, source = self._fetch_rows(chosen_date, use_cache)
+        duration = time.perf_counter() - started
+        metrics.observe('fetch', duration)
+        metrics.increment(f'pages_{source}')
+        metrics.increment('rows_parsed', len(rows or []))
+        if unparsed:
+            metrics.increment('rows_failed', unparsed)
+        log_event('fetch', date=chosen_date, source=source, rows=len(rows or []), failed=unparsed,
+                  seconds=round(duration, 3))
+        return rows
+
+    def _fetch_rows(self, chosen_date, use_cache):
+        # Intraday pages are still changing, so live polling and any run on
+        # the day itself skip the cache.
+        trade_date = parse_date(chosen_date).date()
+        use_cache = use_cache and self.page_cache is not None and trade_date < date.today()
+        if use_cache:
+            html = self.page_cache.get(trade_date)
+            if html is not None:
+                rows, unparsed = parse_quotes_page(html)
+                # A cached page is only trusted when it parses back to every
+                # row the table held when it was stored.
+                if rows and len(rows) + unparsed == self.page_cache.row_count(trade_date):
+                    print(f"Using cached page for {trade_date}.")
+                    return rows, unparsed, 'cached'
+                print(f"Cached page for {trade_date} is incomplete, downloading it again.")
+
+        url = QUOTES_URL.format(date=chosen_date)
+        if self.rate_limiter:
+            with metrics.timer('rate_limit'):
+                self.rate_limiter.wait(url)
+        with metrics.timer('page_load'):
+            self.driver.get(url)
+        self.accept_cookies()
+
+        # Without a settled row count nothing extracted from the page can be
+        # trusted to be the whole day.
+        try:
+            number_of_elements = self.wait_for_quotes_table()
+        except Exception as e:
+            print(f"Error while retrieving elements: {str(e)}")
+            raise IncompleteTableError(f"quotes table for {trade_date} did not finish loading") from e
+
+        rows, unparsed = None, 0
+        if self.bulk_extraction:
+            for source, extract in (('bulk', self.extract_rows_bulk), ('page_source', self.extract_rows_from_page_source)):
+                try:
+                    with metrics.timer(f'extract_{source}'):
+                        rows, unparsed = extract()
+                except Exception as e:
+                    print(f"Error while retrieving table in bulk: {str(e)}")
+                    rows = None
+                if rows is not None and len(rows) + unparsed >= number_of_elements:
+                    break
+                rows = None
+        if rows is None:
+            print("Bulk extraction failed, falling back to per-row extraction.")
+            source = 'per_row'
+            with metrics.timer('extract_per_row'):
+                rows, unparsed = self.extract_rows_per_row(number_of_elements)
+        if len(rows) + unparsed < number_of_elements:
+            # A half-filled day would be taken as stored and never scraped
+            # again, so the date fails and is retried on the next run. Rows
+            # that were read but could not be parsed are skipped instead, as
+            # they would fail the same way on every retry.
+            metrics.increment('pages_incomplete')
+            raise IncompleteTableError(f"only {len(rows) + unparsed} of {number_of_elements} rows read for {trade_date}")
+        if unparsed:
+            print(f"Skipped {unparsed} unparseable rows for {trade_date}.")
+
+        if rows and use_cache:
+            try:
+                self._cache_page(trade_date, number_of_elements)
+            except Exception as e:
+                print(f"Error while caching page for {trade_date}: {str(e)}")
+        return rows, unparsed, source
+
+    def _cache_page(self, trade_date, number_of_elements):
+        # The rows may have come from the bulk script or per-row reads, so the
+        # markup is only kept if the cache's own parser finds every row in it.
+        html = self.driver.page_source
+        page_rows, unparsed = parse_quotes_page(html)
+        if len(page_rows) + unparsed != number_of_elements:
+            print(f"Page source for {trade_date} parses to {len(page_rows) + unparsed} of {number_of_elements} rows, not caching it.")
+            return
+        self.page_cache.put(trade_date, html, rows=number_of_elements)
 
     def retrieve_stock_data(self, chosen_date):
         parsed_date = self.parse_date(chosen_date)
         if not parsed_date:
             return
         
-        chosen_date_ = parsed_date.strftime("%d_%m_%Y")
-        
-        self.driver.get(f'https://www.money.pl/gielda/gpw/akcje/?date={chosen_date}')
-        self.accept_cookies()
+        trade_date = parsed_date.date()
 
-        Base = declarative_base()
-        class StockData(Base):
-            __tablename__ = f'stock_data_{chosen_date_}'
-            id = Column(Integer, primary_key=True)
-            company_name = Column(String)
-            value_change = Column(Float)
-            end_day_value = Column(Float)
-            trading_value = Column(Integer)
-            max_value = Column(Float)
-            trade_date = chosen_date_
-
-            # def __init__(self, date):
-            #     """
-            #     Initializes a StockData instance with the provided date.
-            #     Args:
-            #         date (datetime.date): The date for which the stock data is retrieved.
-            #     """
-            #     self.__tablename__ = f'stock_data_{chosen_date_}'
+        if not get_calendar().is_session(trade_date):
+            print(f"{trade_date} is not a GPW session, skipping download.")
+            return
 
-        
         session = self.create_database_session()
+        try:
+            stored_rows = stored_row_count(session, trade_date)
+            if stored_rows:
+                print(f"Quotes for {trade_date} already exist, skipping download.")
+                return stored_rows
+
+            rows = self.fetch_rows(chosen_date)
+
+            if not rows:
+                print(f"No rows retrieved for {trade_date}, nothing stored.")
+                stored_rows = 0
+            else:
+                print(f"Storing {len(rows)} quotes for {trade_date}.")
+                stored_rows = store_rows(session, trade_date, rows)
+        finally:
+            session.close()
 
+        # print("Finished")
+        return stored_rows
+
+
+def quotes_table_exists(bind):
+    engine = bind.engine
+    with _engines_lock:
+        if engine in _engines_with_quotes:
+            return True
+    if not inspect(bind).has_table(Quote.__tablename__):
+        return False
+    with _engines_lock:
+        _engines_with_quotes.add(engine)
+    return True
 
-        time.sleep(2)
 
+def stored_row_count(session, trade_date):
+    if not quotes_table_exists(session.get_bind()):
+        return 0
+    return session.query(Quote).filter(Quote.trade_date == trade_date).count()
 
 
-        if inspect(session.bind).has_table(StockData.__tablename__):
-            print(f"Table {StockData.__tablename__} already exists, skipping creation.")
-        else:
-            print(f"Table {StockData.__tablename__} doesn't exist, creating it.")
-            Base.metadata.create_all(session.bind)
+def is_date_stored(session, trade_date):
+    return stored_row_count(session, trade_date) > 0
+
+
+def store_rows(session, trade_date, rows):
+    # The month partition is created in the same transaction as the day's
+    # rows, so a failed write rolls back without leaving a half-filled day.
+    try:
+        with metrics.timer('db_transaction'):
+            connection = session.connection()
+            if not quotes_table_exists(connection):
+                create_schema(connection)
+            ensure_partition(connection, trade_date)
+            session.execute(insert(Quote), [dict(row, trade_date=trade_date) for row in rows])
+            session.commit()
+    except Exception:
+        metrics.increment('db_transactions_failed')
+        session.rollback()
+        raise
+    metrics.increment('rows_stored', len(rows))
+    return len(rows)
 
+
+class DriverPool:
+    """Keeps warm StockDataRetriever instances alive across several dates."""
+
+    def __init__(self, size=1, bulk_extraction=True, rate_limiter=None, page_cache=None):
+        self.size = size
+        self.bulk_extraction = bulk_extraction
+        self.rate_limiter = rate_limiter
+        self.page_cache = page_cache
+        self._retrievers = []
+        self._idle = queue.Queue()
+
+    def __enter__(self):
+        self.start()
+        return self
+
+    def __exit__(self, exc_type, exc_value, traceback):
+        self.close()
+
+    def start(self):
+        while len(self._retrievers) < self.size:
+            retriever = StockDataRetriever(bulk_extraction=self.bulk_extraction, rate_limiter=self.rate_limiter,
+                                           page_cache=self.page_cache)
+            # Without a cache every date needs a browser, so start them up
+            # front; with one, a browser starts on its first cache miss.
+            if self.page_cache is None:
+                retriever.start()
+            self._retrievers.append(retriever)
+            self._idle.put(retriever)
+
+    def close(self):
+        for retriever in self._retrievers:
             try:
-                all_div_elements = WebDriverWait(self.driver, 4).until(
-                EC.visibility_of_all_elements_located((By.CSS_SELECTOR, "div.rt-tr-group")))
+                retriever.close()
             except Exception as e:
-                print(f"Error while retrieving elements: {str(e)}")
-                
-            number_of_elements = len(all_div_elements)
-
-            i = 0
-
-            while i < number_of_elements:
-                i += 1
-                
-                company_names = f"div.rt-tr-group:nth-child({i}) > div:nth-child(1) > div:nth-child(1) > a:nth-child(1) > div:nth-child(1)"
-                value_change = f"div.rt-tr-group:nth-child({i}) > div:nth-child(1) > div:nth-child(3) > div:nth-child(1)"
-                end_day_value = f"div.rt-tr-group:nth-child({i}) > div:nth-child(1) > div:nth-child(2) > div:nth-child(1)"
-                trading_amount = f"div.rt-tr-group:nth-child({i}) > div:nth-child(1) > div:nth-child(8) > div:nth-child(1)"
-                max_value = f"div.rt-tr-group:nth-child({i}) > div:nth-child(1) > div:nth-child(6) > div:nth-child(1)"
-
-                elements_list = [company_names, value_change, end_day_value, trading_amount, max_value]
-                
-                try:
-                    elements = [WebDriverWait(self.driver, 4).until(
-                        EC.visibility_of_element_located((By.CSS_SELECTOR, element))) for element in elements_list]
-                    
-                    def replace_decimal_separator(text):
-                        text = text.replace(',', '.').replace(' ', '').replace('—', '0')
-                        return float(text)
-
-                    company_name = elements[0].text
-                    value_change = replace_decimal_separator(elements[1].text)
-                    end_day_value = replace_decimal_separator(elements[2].text)
-                    trading_value = replace_decimal_separator(elements[3].text)
-                    max_value = replace_decimal_separator(elements[4].text)
-                    max_value = round(max_value * VALUE_ADJUSTMENT, 2)
-                    
-                    stock_data = StockData(company_name=company_name, value_change=value_change, end_day_value=end_day_value, trading_value=trading_value, max_value=max_value)
-                    session.add(stock_data)
-                    session.commit()
-
-                except StaleElementReferenceException:
-                    print(f"Error while retrieving from div {i}: Element is stale")
-                    i -= 1
+                print(f"Error while closing driver: {str(e)}")
+        self._retrievers = []
+        self._idle = queue.Queue()
+
+    @contextmanager
+    def acquire(self):
+        retriever = self._idle.get()
+        try:
+            yield retriever
+        finally:
+            self._idle.put(retriever)
+
+
+def is_session_date(chosen_date):
+    parsed_date = parse_date(chosen_date)
+    return parsed_date is not None and get_calendar().is_session(parsed_date.date())
+
+
+def backfill(dates, drivers=1):
+    """Download the session dates among `dates` and report whether each one
+    succeeded. Browsers fetch in parallel, but a single writer thread stores
+    the days, so concurrent partition DDL cannot fail a date."""
+    # pipeline builds on this module, so it is imported on first use.
+    from pipeline import FAILED, FetchPipeline
+    trade_dates = {date: parse_date(date).date() for date in dates if is_session_date(date)}
+    if not trade_dates:
+        return {}
+    results = FetchPipeline(workers=drivers, page_cache=default_page_cache()).run(dict.fromkeys(trade_dates.values()))
+    return {date: results[trade_date][0] != FAILED for date, trade_date in trade_dates.items()}
+
+
+def backfill_range(start_date, end_date, drivers=1):
+    sessions = get_calendar().sessions_between(start_date, end_date)
+    return backfill([session.strftime("%Y-%m-%d") for session in sessions], drivers=drivers)
 
-                except Exception as e:
-                    print(f"Error while retrieving from div {i}: {str(e)}")
 
-        self.driver.quit()
-        # print("Finished")
 # date = '2024-03-20'
-def main(date):
-    # parser = argparse.ArgumentParser(description="Stock data downloader")
-    # parser.add_argument("date", type=str, help="Date in format YYYY-MM-DD")
-    # args = parser.parse_args()
-    # date = args.date
-    # print(f"Downloading data for date: {date}")
-    
-    retriever = StockDataRetriever()
-    try:
-        retriever.retrieve_stock_data(date)
-    except Exception as e:
-        print(f"An error occurred: {str(e)}")
-    finally:
-        retriever.driver.quit()
+def main(date=None):
+    if date is None:
+        parser = argparse.ArgumentParser(description="Stock data downloader")
+        parser.add_argument("date", type=str, help="Date in format YYYY-MM-DD")
+        args = parser.parse_args()
+        date = args.date
+        print(f"Downloading data for date: {date}")
+
+    with StockDataRetriever(page_cache=default_page_cache()) as retriever:
+        try:
+            retriever.retrieve_stock_data(date)
+        except Exception as e:
+            print(f"An error occurred: {str(e)}")
+    write_metrics()
 
 if __name__ == '__main__':
     main()
\ No newline at end of file
@@ -0,0 +1,10 @@
+# Kept apart from screener so alerting can format hits without importing
+# pandas.
+
+
+def format_hit(hit):
+    return f"Think to buy: {hit.company_name:26} | {hit.end_day_value:7}  |  {int(hit.trading_value):8}  |  {hit.all_grow}"
+
+
+def format_hits(hits):
+    return '\n'.join(format_hit(hit) for hit in hits.itertuples(index=False))
@@ -0,0 +1,102 @@
+import json
+import os
+import threading
+import time
+from contextlib import contextmanager
+from datetime import datetime
+
+PREFIX = 'gpw'
+
+
+class Metrics:
+    """Thread-safe counters and stage timers collected over one run."""
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self.counters = {}
+        self.timers = {}
+
+    def increment(self, name, value=1):
+        with self._lock:
+            self.counters[name] = self.counters.get(name, 0) + value
+
+    def observe(self, stage, seconds):
+        with self._lock:
+            count, total = self.timers.get(stage, (0, 0.0))
+            self.timers[stage] = (count + 1, total + seconds)
+
+    @contextmanager
+    def timer(self, stage):
+        started = time.perf_counter()
+        try:
+            yield
+        finally:
+            self.observe(stage, time.perf_counter() - started)
+
+    def reset(self):
+        with self._lock:
+            self.counters = {}
+            self.timers = {}
+
+    def snapshot(self):
+        with self._lock:
+            return {
+                'counters': dict(self.counters),
+                'timers': {stage: {'count': count, 'seconds': round(total, 6)}
+                           for stage, (count, total) in self.timers.items()},
+            }
+
+    def prometheus(self):
+        """The metrics in the Prometheus text exposition format."""
+        snapshot = self.snapshot()
+        lines = []
+        for name, value in sorted(snapshot['counters'].items()):
+            lines.append(f"# TYPE {PREFIX}_{name}_total counter")
+            lines.append(f"{PREFIX}_{name}_total {value}")
+        if snapshot['timers']:
+            lines.append(f"# TYPE {PREFIX}_stage_seconds summary")
+            for stage, timer in sorted(snapshot['timers'].items()):
+                lines.append(f'{PREFIX}_stage_seconds_sum{{stage="{stage}"}} {timer["seconds"]}')
+                lines.append(f'{PREFIX}_stage_seconds_count{{stage="{stage}"}} {timer["count"]}')
+        return '\n'.join(lines) + '\n'
+
+    def write_prometheus(self, path):
+        # The textfile collector may read at any moment, so the file is
+        # replaced in one step rather than rewritten in place.
+        temporary_path = f"{path}.tmp"
+        with open(temporary_path, 'w', encoding='utf-8') as metrics_file:
+            metrics_file.write(self.prometheus())
+        os.replace(temporary_path, path)
+
+    def summary(self):
+        snapshot = self.snapshot()
+        stages = ', '.join(f"{stage} {timer['seconds']:.1f}s/{timer['count']}"
+                           for stage, timer in sorted(snapshot['timers'].items(), key=lambda item: -item[1]['seconds']))
+        counters = ', '.join(f"{name}={value}" for name, value in sorted(snapshot['counters'].items()))
+        return f"Stages: {stages or 'none'}. Counters: {counters or 'none'}."
+
+
+metrics = Metrics()
+_log_lock = threading.Lock()
+
+
+def log_event(event, path=None, **fields):
+    """Append one JSON line to $METRICS_LOG (or `path`); a no-op when neither is set."""
+    path = path or os.getenv('METRICS_LOG')
+    if not path:
+        return
+    record = {'time': datetime.now().isoformat(timespec='seconds'), 'event': event, **fields}
+    with _log_lock, open(path, 'a', encoding='utf-8') as log_file:
+        log_file.write(json.dumps(record, default=str) + '\n')
+
+
+def write_metrics(prometheus_path=None, log_path=None):
+    """Print the run summary and flush it to $METRICS_FILE and $METRICS_LOG when configured."""
+    print(metrics.summary())
+    prometheus_path = prometheus_path or os.getenv('METRICS_FILE')
+    try:
+        if prometheus_path:
+            metrics.write_prometheus(prometheus_path)
+        log_event('run', path=log_path, **metrics.snapshot())
+    except Exception as e:
+        print(f"Error while writing metrics: {str(e)}")
@@ -0,0 +1,63 @@
+import argparse
+import re
+from datetime import datetime
+
+from sqlalchemy import inspect, text
+
+from database import get_engine
+from models import Quote, create_schema, ensure_partition
+
+LEGACY_TABLE_PATTERN = re.compile(r'^stock_data_(\d{2}_\d{2}_\d{4})$')
+
+
+def legacy_tables(connection):
+    tables = []
+    for table_name in inspect(connection).get_table_names():
+        match = LEGACY_TABLE_PATTERN.match(table_name)
+        if match:
+            tables.append((table_name, datetime.strptime(match.group(1), "%d_%m_%Y").date()))
+    return sorted(tables, key=lambda table: table[1])
+
+
+def migrate_table(connection, table_name, trade_date):
+    ensure_partition(connection, trade_date)
+    # Old per-day tables could hold the same company twice after a stale
+    # element retry; the first copy wins.
+    result = connection.execute(text(
+        f"INSERT INTO {Quote.__tablename__} "
+        "(trade_date, company_name, value_change, end_day_value, trading_value, max_value) "
+        "SELECT :trade_date, company_name, value_change, end_day_value, trading_value, max_value "
+        f"FROM {table_name} WHERE company_name IS NOT NULL ORDER BY id "
+        "ON CONFLICT DO NOTHING"
+    ), {'trade_date': trade_date})
+    return result.rowcount
+
+
+def migrate(engine, drop_legacy=False):
+    with engine.begin() as connection:
+        create_schema(connection)
+        tables = legacy_tables(connection)
+
+    migrated = {}
+    for table_name, trade_date in tables:
+        # One transaction per day, so an interrupted run can simply be
+        # started again.
+        with engine.begin() as connection:
+            migrated[trade_date] = migrate_table(connection, table_name, trade_date)
+            if drop_legacy:
+                connection.execute(text(f"DROP TABLE {table_name}"))
+        print(f"Migrated {migrated[trade_date]} rows from {table_name}.")
+    return migrated
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Import per-day stock_data_DD_MM_YYYY tables into the quotes table")
+    parser.add_argument("--drop-legacy", action="store_true", help="Drop each per-day table once its rows are imported")
+    args = parser.parse_args()
+
+    migrated = migrate(get_engine(), drop_legacy=args.drop_legacy)
+    print(f"Migrated {sum(migrated.values())} rows from {len(migrated)} tables.")
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,53 @@
+from datetime import timedelta
+
+from sqlalchemy import BigInteger, Column, Date, DateTime, Float, Index, Integer, String, text
+from sqlalchemy.orm import declarative_base
+
+Base = declarative_base()
+
+
+class Quote(Base):
+    __tablename__ = 'quotes'
+    trade_date = Column(Date, primary_key=True)
+    company_name = Column(String, primary_key=True)
+    value_change = Column(Float)
+    end_day_value = Column(Float)
+    trading_value = Column(BigInteger)
+    max_value = Column(Float)
+
+    __table_args__ = (
+        Index('ix_quotes_company_name_trade_date', 'company_name', 'trade_date'),
+        {'postgresql_partition_by': 'RANGE (trade_date)'},
+    )
+
+
+class ScrapeManifest(Base):
+    """One row per trade date a backfill has attempted, with its outcome."""
+    __tablename__ = 'scrape_manifest'
+    trade_date = Column(Date, primary_key=True)
+    status = Column(String, nullable=False)
+    rows = Column(Integer)
+    duration = Column(Float)
+    error = Column(String)
+    updated_at = Column(DateTime)
+
+
+def partition_name(trade_date):
+    return f"{Quote.__tablename__}_{trade_date:%Y_%m}"
+
+
+def ensure_partition(connection, trade_date):
+    # Only PostgreSQL partitions the table; other backends (SQLite in tests)
+    # keep every month in the parent table.
+    if connection.dialect.name != 'postgresql':
+        return
+    month_start = trade_date.replace(day=1)
+    month_end = (month_start + timedelta(days=32)).replace(day=1)
+    connection.execute(text(
+        f"CREATE TABLE IF NOT EXISTS {partition_name(trade_date)} PARTITION OF {Quote.__tablename__} "
+        f"FOR VALUES FROM ('{month_start.isoformat()}') TO ('{month_end.isoformat()}')"
+    ))
+
+
+def create_schema(connection):
+    Base.metadata.create_all(connection)
@@ -0,0 +1,139 @@
+import gzip
+import hashlib
+import json
+import os
+import threading
+import time
+
+MAX_CACHE_BYTES = int(os.getenv('PAGE_CACHE_MAX_BYTES', 512 * 1024 * 1024))
+
+
+class PageCache:
+    """Gzipped raw quote pages keyed by trade date.
+
+    index.json keeps the SHA-256 of every page, its size on disk, how many
+    quote rows it holds and when it was last read; the least recently read pages are evicted once the cache
+    grows past `max_bytes`. Reads only touch the index in memory; it is
+    written on the next put or eviction, merged with what other processes
+    sharing the directory wrote in the meantime.
+    """
+
+    INDEX_NAME = 'index.json'
+
+    def __init__(self, directory, max_bytes=MAX_CACHE_BYTES):
+        self.directory = directory
+        self.max_bytes = max_bytes
+        self._lock = threading.Lock()
+        os.makedirs(directory, exist_ok=True)
+        self._index = self._load_index()
+        # Changes not yet written to index.json.
+        self._added = {}
+        self._accessed = {}
+        self._removed = set()
+
+    def _index_path(self):
+        return os.path.join(self.directory, self.INDEX_NAME)
+
+    def _page_path(self, key):
+        return os.path.join(self.directory, f"{key}.html.gz")
+
+    def _load_index(self):
+        try:
+            with open(self._index_path(), encoding='utf-8') as index_file:
+                return json.load(index_file)
+        except (OSError, ValueError):
+            return {}
+
+    def _save_index(self):
+        # Another process may have rewritten the index since it was loaded,
+        # so only this cache's own changes are applied on top of the file.
+        index = self._load_index()
+        for key in self._removed:
+            index.pop(key, None)
+        index.update(self._added)
+        for key, accessed in self._accessed.items():
+            if key in index:
+                index[key]['accessed'] = max(index[key]['accessed'], accessed)
+        self._index = index
+        self._evict()
+
+        temporary_path = f"{self._index_path()}.tmp"
+        with open(temporary_path, 'w', encoding='utf-8') as index_file:
+            json.dump(self._index, index_file, indent=1, sort_keys=True)
+        os.replace(temporary_path, self._index_path())
+        self._added, self._accessed, self._removed = {}, {}, set()
+
+    def __contains__(self, trade_date):
+        return trade_date.isoformat() in self._index
+
+    def row_count(self, trade_date):
+        """Quote rows the page held when it was stored, or None if unknown."""
+        entry = self._index.get(trade_date.isoformat())
+        return entry.get('rows') if entry else None
+
+    def size(self):
+        return sum(entry['size'] for entry in self._index.values())
+
+    def get(self, trade_date):
+        key = trade_date.isoformat()
+        with self._lock:
+            entry = self._index.get(key)
+            if entry is None:
+                # The page may have been stored by another process since.
+                entry = self._load_index().get(key)
+                if entry is None:
+                    return None
+                self._index[key] = entry
+            try:
+                with gzip.open(self._page_path(key), 'rb') as page_file:
+                    data = page_file.read()
+            except OSError:
+                data = None
+            if data is None or hashlib.sha256(data).hexdigest() != entry['sha256']:
+                print(f"Cached page for {key} is missing or corrupt, dropping it.")
+                self._remove(key)
+                self._save_index()
+                return None
+            entry['accessed'] = self._accessed[key] = time.time()
+        return data.decode('utf-8')
+
+    def put(self, trade_date, html, rows=None):
+        key = trade_date.isoformat()
+        data = html.encode('utf-8')
+        page_path = self._page_path(key)
+        with self._lock:
+            temporary_path = f"{page_path}.tmp"
+            with gzip.open(temporary_path, 'wb') as page_file:
+                page_file.write(data)
+            os.replace(temporary_path, page_path)
+            self._index[key] = self._added[key] = {
+                'sha256': hashlib.sha256(data).hexdigest(),
+                'size': os.path.getsize(page_path),
+                'rows': rows,
+                'accessed': time.time(),
+            }
+            self._removed.discard(key)
+            self._save_index()
+
+    def _remove(self, key):
+        self._index.pop(key, None)
+        self._added.pop(key, None)
+        self._accessed.pop(key, None)
+        self._removed.add(key)
+        try:
+            os.remove(self._page_path(key))
+        except OSError:
+            pass
+
+    def _evict(self):
+        total = self.size()
+        for key, entry in sorted(self._index.items(), key=lambda item: item[1]['accessed']):
+            if total <= self.max_bytes:
+                break
+            total -= entry['size']
+            self._remove(key)
+
+
+def default_page_cache():
+    directory = os.getenv('PAGE_CACHE_DIR')
+    return PageCache(directory) if directory else None
@@ -0,0 +1,66 @@
+import re
+from html import unescape
+
+VALUE_ADJUSTMENT = 0.95
+
+# Positions of company_name, value_change, end_day_value, trading_value and
+# max_value among the rt-td cells of a quotes row.
+QUOTE_COLUMNS = (0, 2, 1, 7, 5)
+
+ROW_PATTERN = re.compile(r'<div[^>]*\sclass="rt-tr-group(?:\s[^"]*)?"[^>]*>')
+CELL_PATTERN = re.compile(r'<div[^>]*\sclass="rt-td(?:\s[^"]*)?"[^>]*>')
+TAG_PATTERN = re.compile(r'<[^>]*>')
+
+
+def replace_decimal_separator(text):
+    text = text.replace(',', '.').replace(' ', '').replace('\xa0', '').replace('—', '0')
+    return float(text)
+
+
+def normalize_row(cells):
+    company_name, value_change, end_day_value, trading_value, max_value = cells
+    return {
+        'company_name': company_name,
+        'value_change': replace_decimal_separator(value_change),
+        'end_day_value': replace_decimal_separator(end_day_value),
+        'trading_value': replace_decimal_separator(trading_value),
+        'max_value': round(replace_decimal_separator(max_value) * VALUE_ADJUSTMENT, 2),
+    }
+
+
+def extract_table_cells(html):
+    # Quote rows only live inside the table body, so everything before it
+    # (styles, scripts) and after it (loading overlay, footer) is cut off
+    # before splitting the markup into rows and cells.
+    start = html.find('class="rt-tbody"')
+    if start != -1:
+        end = html.find('class="-loading"', start)
+        html = html[start:html.rfind('<', start, end) if end != -1 else len(html)]
+    rows = []
+    for row in ROW_PATTERN.split(html)[1:]:
+        cells = CELL_PATTERN.split(row)[1:]
+        rows.append([unescape(TAG_PATTERN.sub('', cell)).strip() for cell in cells])
+    return rows
+
+
+def parse_quotes_page(html):
+    """The parsed rows of a quotes page and the number of rows on it that
+    could not be parsed."""
+    rows = []
+    unparsed = 0
+    for i, cells in enumerate(extract_table_cells(html), start=1):
+        try:
+            rows.append(normalize_row([cells[column] for column in QUOTE_COLUMNS]))
+        except Exception as e:
+            print(f"Error while parsing row {i}: {str(e)}")
+            unparsed += 1
+    return rows, unparsed
+
+
+def parse_quotes_html(html):
+    return parse_quotes_page(html)[0]
+
+
+def parse_quotes_file(path):
+    with open(path, encoding='utf-8') as html_file:
+        return parse_quotes_html(html_file.read())
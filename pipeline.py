@@ -0,0 +1,103 @@
+import queue
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+from urllib.parse import urlparse
+
+from database import create_database_session
+from downloader import DriverPool, store_rows, stored_row_count
+
+DONE = 'done'
+EMPTY = 'empty'
+FAILED = 'failed'
+
+MIN_INTERVAL = 1.0
+
+
+class RateLimiter:
+    """Spaces out requests to the same host by at least `min_interval` seconds."""
+
+    def __init__(self, min_interval=MIN_INTERVAL):
+        self.min_interval = min_interval
+        self._lock = threading.Lock()
+        self._next_slot = {}
+
+    def wait(self, url):
+        host = urlparse(url).netloc
+        with self._lock:
+            now = time.monotonic()
+            slot = max(now, self._next_slot.get(host, now))
+            self._next_slot[host] = slot + self.min_interval
+        if slot > now:
+            time.sleep(slot - now)
+
+
+class FetchPipeline:
+    """Fetches dates on `workers` browsers while a single writer thread
+    stores finished days, so page loads overlap database writes."""
+
+    def __init__(self, workers=2, min_interval=MIN_INTERVAL, queue_size=None, on_result=None, page_cache=None):
+        self.workers = workers
+        self.rate_limiter = RateLimiter(min_interval)
+        self.page_cache = page_cache
+        self.queue_size = queue_size or workers * 2
+        self.on_result = on_result
+
+    def run(self, trade_dates):
+        trade_dates = list(trade_dates)
+        results = {}
+        if not trade_dates:
+            return results
+
+        fetched = queue.Queue(maxsize=self.queue_size)
+        writer = threading.Thread(target=self._write, args=(fetched, results))
+        writer.start()
+        try:
+            with DriverPool(size=min(self.workers, len(trade_dates)), rate_limiter=self.rate_limiter,
+                            page_cache=self.page_cache) as pool, \
+                    ThreadPoolExecutor(max_workers=pool.size) as executor:
+                for trade_date in trade_dates:
+                    executor.submit(self._fetch, pool, trade_date, fetched)
+        finally:
+            fetched.put(None)
+            writer.join()
+        return results
+
+    def _fetch(self, pool, trade_date, fetched):
+        started = time.perf_counter()
+        rows, stored_rows, error = None, 0, None
+        try:
+            session = create_database_session()
+            stored_rows = stored_row_count(session, trade_date)
+            session.close()
+            if not stored_rows:
+                with pool.acquire() as retriever:
+                    rows = retriever.fetch_rows(trade_date.isoformat())
+        except Exception as e:
+            error = str(e)
+        fetched.put((trade_date, rows, stored_rows, error, started))
+
+    def _write(self, fetched, results):
+        session = create_database_session()
+        while True:
+            item = fetched.get()
+            if item is None:
+                break
+            trade_date, rows, stored_rows, error, started = item
+            if error is None and rows:
+                try:
+                    stored_rows = store_rows(session, trade_date, rows)
+                except Exception as e:
+                    error = str(e)
+            if error is not None:
+                status, stored_rows = FAILED, 0
+            else:
+                status = DONE if stored_rows else EMPTY
+            duration = time.perf_counter() - started
+            results[trade_date] = (status, stored_rows, duration)
+            if self.on_result:
+                try:
+                    self.on_result(trade_date, status, stored_rows, duration, error)
+                except Exception as e:
+                    print(f"Error while reporting {trade_date}: {str(e)}")
+        session.close()
@@ -0,0 +1,143 @@
+import numpy as np
+import pandas as pd
+
+from sqlalchemy import select
+
+from backtest import QuoteMatrix
+from metrics import metrics
+from models import Quote
+from screener import QUOTE_FIELDS, SCREEN_DAYS, TRADING_VALUE_FILTER
+
+SCREEN_COLUMNS = ['company_name', 'end_day_value', 'trading_value', 'all_grow', 'streak']
+
+# Company ids and day numbers are packed into one sortable int64 key.
+_DAY_BITS = 32
+
+
+class QuoteStore:
+    """Quote history held as flat column arrays sorted by company and date.
+
+    Company names are interned to integer ids, and `offsets[id]` to
+    `offsets[id + 1]` is the date-ordered slice of that company, so the last
+    N sessions of a company are a view taken in constant time. Load it once
+    from the database and screen or backtest it as often as needed.
+    """
+
+    def __init__(self, companies, company, trade_date, columns):
+        self.companies = companies
+        self.company_ids = {name: i for i, name in enumerate(companies)}
+        self.company = company
+        self.trade_date = trade_date
+        self.columns = columns
+        self.offsets = np.searchsorted(company, np.arange(len(companies) + 1)).astype(np.int64)
+        self.trade_dates = np.unique(trade_date)
+        self._keys = (company.astype(np.int64) << _DAY_BITS) + trade_date.astype(np.int64)
+
+    @classmethod
+    def from_frame(cls, frame):
+        companies, company = np.unique(frame['company_name'].to_numpy(dtype=object), return_inverse=True)
+        company = company.astype(np.int32)
+        trade_date = pd.to_datetime(frame['trade_date']).to_numpy().astype('datetime64[D]')
+        order = np.lexsort((trade_date, company))
+        columns = {
+            'value_change': frame['value_change'].to_numpy(dtype=np.float64)[order],
+            'end_day_value': frame['end_day_value'].to_numpy(dtype=np.float64)[order],
+            'trading_value': frame['trading_value'].to_numpy(dtype=np.int64)[order],
+            'max_value': frame['max_value'].to_numpy(dtype=np.float64)[order],
+        }
+        return cls(companies, company[order], trade_date[order], columns)
+
+    @classmethod
+    def from_database(cls, session, start_date=None, end_date=None):
+        query = select(Quote.trade_date, Quote.company_name, *[getattr(Quote, field) for field in QUOTE_FIELDS])
+        if start_date is not None:
+            query = query.where(Quote.trade_date >= start_date)
+        if end_date is not None:
+            query = query.where(Quote.trade_date <= end_date)
+        with metrics.timer('quote_store_load'):
+            frame = pd.DataFrame(session.execute(query).all(), columns=['trade_date', 'company_name', *QUOTE_FIELDS])
+            return cls.from_frame(frame)
+
+    def __len__(self):
+        return len(self.company)
+
+    def __contains__(self, company_name):
+        return company_name in self.company_ids
+
+    @property
+    def nbytes(self):
+        arrays = [self.company, self.trade_date, self.offsets, self._keys, *self.columns.values()]
+        return sum(array.nbytes for array in arrays)
+
+    def last(self, company_name, sessions=SCREEN_DAYS):
+        """The company's last `sessions` quotes as array views, oldest first."""
+        company_id = self.company_ids[company_name]
+        end = self.offsets[company_id + 1]
+        window = slice(max(self.offsets[company_id], end - sessions), end)
+        return {'trade_date': self.trade_date[window], **{field: values[window] for field, values in self.columns.items()}}
+
+    def add_day(self, trade_date, rows):
+        """Merge one downloaded day into the store, replacing rows already there."""
+        day = pd.DataFrame(rows, columns=['company_name', *QUOTE_FIELDS]).assign(trade_date=trade_date)
+        frame = self.to_frame()
+        frame = pd.concat([frame[frame['trade_date'] != trade_date], day], ignore_index=True)
+        stored = QuoteStore.from_frame(frame)
+        self.__init__(stored.companies, stored.company, stored.trade_date, stored.columns)
+
+    def to_frame(self):
+        return pd.DataFrame({
+            'trade_date': self.trade_date.astype(object),
+            'company_name': self.companies[self.company],
+            **self.columns,
+        })
+
+    def _window(self, days, until):
+        # Row indices of each company's last `days` quotes on or before `until`,
+        # and whether they are exactly the last `days` sessions of the store.
+        trade_dates = self.trade_dates
+        if until is not None:
+            trade_dates = trade_dates[:np.searchsorted(trade_dates, np.datetime64(until, 'D'), side='right')]
+        if len(trade_dates) < days:
+            return None, None
+        trade_dates = trade_dates[-days:]
+
+        company_ids = np.arange(len(self.companies), dtype=np.int64)
+        end = np.searchsorted(self._keys, (company_ids << _DAY_BITS) + trade_dates[-1].astype(np.int64), side='right')
+        index = end[:, None] - days + np.arange(days)
+        complete = (index >= self.offsets[:-1, None]).all(axis=1)
+        index = np.where(complete[:, None], index, 0)
+        complete &= (self.trade_date[index] == trade_dates).all(axis=1)
+        return index, complete
+
+    @metrics.timer('quote_store_screen')
+    def screen(self, days=SCREEN_DAYS, trading_value_filter=TRADING_VALUE_FILTER, until=None):
+        """The same hits as screener.screen over the last `days` sessions on or before `until`."""
+        index, complete = self._window(days, until) if len(self) else (None, None)
+        if index is None:
+            return pd.DataFrame(columns=SCREEN_COLUMNS)
+
+        value_change = self.columns['value_change'][index]
+        hit = (complete
+               & (value_change > 0).all(axis=1)
+               & (self.columns['trading_value'][index] > trading_value_filter).all(axis=1)
+               & (self.columns['end_day_value'][index[:, -1]] >= self.columns['max_value'][index[:, -1]]))
+        last = index[hit, -1]
+        hits = pd.DataFrame({
+            'company_name': self.companies[hit],
+            'end_day_value': self.columns['end_day_value'][last],
+            'trading_value': self.columns['trading_value'][last].astype(float),
+            'all_grow': value_change[hit].sum(axis=1).round(2),
+            'streak': np.full(int(hit.sum()), days),
+        }, columns=SCREEN_COLUMNS)
+        return hits.sort_values('all_grow', ascending=False, kind='stable').reset_index(drop=True)
+
+    def matrix(self):
+        """The companies x sessions arrays backtest.evaluate works on."""
+        shape = (len(self.companies), len(self.trade_dates))
+        date_index = np.searchsorted(self.trade_dates, self.trade_date)
+        arrays = {}
+        for field in QUOTE_FIELDS:
+            values = np.full(shape, np.nan)
+            values[self.company, date_index] = self.columns[field]
+            arrays[field] = values
+        return QuoteMatrix(self.companies, [day.item() for day in self.trade_dates], arrays)
@@ -0,0 +1,125 @@
+import os
+
+import numpy as np
+import pandas as pd
+
+from dotenv import load_dotenv
+from sqlalchemy import func, select
+
+from metrics import metrics
+from models import Quote
+from trading_calendar import get_calendar
+
+load_dotenv()
+
+SCREEN_DAYS = int(os.getenv('SCREEN_DAYS', 3))
+TRADING_VALUE_FILTER = 100000
+
+QUOTE_FIELDS = ['value_change', 'end_day_value', 'trading_value', 'max_value']
+
+
+def load_quotes_frame(session, trade_dates):
+    query = select(Quote.trade_date, Quote.company_name, *[getattr(Quote, field) for field in QUOTE_FIELDS]).where(
+        Quote.trade_date.in_(list(trade_dates)))
+    return pd.DataFrame(session.execute(query).all(), columns=['trade_date', 'company_name', *QUOTE_FIELDS])
+
+
+def pivot_quotes(frame, days=None):
+    """Returns company names, trade dates and one companies x dates array per field.
+
+    Companies missing on a date get NaN, so rows line up by company name
+    instead of by position.
+    """
+    trade_dates = sorted(frame['trade_date'].unique())
+    if days is not None:
+        trade_dates = trade_dates[-days:]
+    wide = frame.pivot(index='company_name', columns='trade_date', values=QUOTE_FIELDS)
+    wide = wide.reindex(columns=pd.MultiIndex.from_product([QUOTE_FIELDS, trade_dates]))
+    arrays = {field: wide[field].to_numpy(dtype=float) for field in QUOTE_FIELDS}
+    return wide.index.to_numpy(), trade_dates, arrays
+
+
+def growth_streak(value_change):
+    # Length of the run of positive changes that ends on the last date.
+    growing = np.nan_to_num(value_change, nan=0.0)[:, ::-1] > 0
+    return np.where(growing.all(axis=1), growing.shape[1], growing.argmin(axis=1))
+
+
+@metrics.timer('screen')
+def screen(frame, days=SCREEN_DAYS, trading_value_filter=TRADING_VALUE_FILTER):
+    """Companies that grew on each of the last `days` sessions, traded above
+    `trading_value_filter` on each of them and closed at or above the
+    adjusted daily max on the last one, best cumulative growth first."""
+    columns = ['company_name', 'end_day_value', 'trading_value', 'all_grow', 'streak']
+    if frame.empty:
+        return pd.DataFrame(columns=columns)
+    companies, trade_dates, arrays = pivot_quotes(frame, days)
+    if len(trade_dates) < days:
+        return pd.DataFrame(columns=columns)
+
+    value_change = arrays['value_change']
+    with np.errstate(invalid='ignore'):
+        liquid = (arrays['trading_value'] > trading_value_filter).all(axis=1)
+        streak = growth_streak(value_change)
+        breakout = arrays['end_day_value'][:, -1] >= arrays['max_value'][:, -1]
+    all_grow = value_change.sum(axis=1)
+    hit = liquid & (streak == days) & breakout
+
+    hits = pd.DataFrame({
+        'company_name': companies[hit],
+        'end_day_value': arrays['end_day_value'][hit, -1],
+        'trading_value': arrays['trading_value'][hit, -1],
+        'all_grow': all_grow[hit].round(2),
+        'streak': streak[hit],
+    }, columns=columns)
+    return hits.sort_values('all_grow', ascending=False, kind='stable').reset_index(drop=True)
+
+
+def build_screen_query(trade_dates, trading_value_filter=TRADING_VALUE_FILTER):
+    """The same screen as `screen` over exactly `trade_dates`, expressed as a
+    single SELECT so only the hits leave the database. A company has to be
+    quoted on every one of the dates, so a date missing from the table
+    yields no hits."""
+    days = len(trade_dates)
+    by_company = {'partition_by': Quote.company_name}
+    window = select(
+        Quote.company_name,
+        Quote.end_day_value,
+        Quote.trading_value,
+        Quote.max_value,
+        func.row_number().over(order_by=Quote.trade_date.desc(), **by_company).label('session_rank'),
+        func.count().over(**by_company).label('sessions'),
+        func.min(Quote.value_change).over(**by_company).label('min_change'),
+        func.sum(Quote.value_change).over(**by_company).label('all_grow'),
+    ).where(
+        Quote.trade_date.in_(list(trade_dates)),
+        Quote.trading_value > trading_value_filter,
+    ).subquery('screen_window')
+
+    return select(
+        window.c.company_name,
+        window.c.end_day_value,
+        window.c.trading_value,
+        window.c.all_grow,
+        window.c.sessions.label('streak'),
+    ).where(
+        window.c.session_rank == 1,
+        window.c.sessions == days,
+        window.c.min_change > 0,
+        window.c.end_day_value >= window.c.max_value,
+    ).order_by(window.c.all_grow.desc(), window.c.company_name)
+
+
+@metrics.timer('screen_database')
+def screen_in_database(session, days=SCREEN_DAYS, trading_value_filter=TRADING_VALUE_FILTER, until=None):
+    # The calendar, not the table, decides which sessions form the window, so
+    # a failed download cannot turn an old window or a gap into fresh hits.
+    trade_dates = get_calendar().previous_sessions(days, until)
+    if len(trade_dates) < days:
+        return pd.DataFrame(columns=['company_name', 'end_day_value', 'trading_value', 'all_grow', 'streak'])
+    hits = pd.DataFrame(
+        session.execute(build_screen_query(trade_dates, trading_value_filter)).all(),
+        columns=['company_name', 'end_day_value', 'trading_value', 'all_grow', 'streak'],
+    )
+    hits['all_grow'] = hits['all_grow'].astype(float).round(2)
+    return hits
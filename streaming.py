@@ -0,0 +1,158 @@
+import argparse
+import time
+from collections import namedtuple
+from datetime import date, datetime, timedelta
+from datetime import time as clock_time
+
+from alerts import FLUSH_TIMEOUT, AlertDispatcher, default_transport
+from database import create_database_session
+from downloader import StockDataRetriever
+from formatting import format_hit
+from metrics import write_metrics
+from screener import SCREEN_DAYS, TRADING_VALUE_FILTER, load_quotes_frame
+from trading_calendar import get_calendar
+
+POLL_INTERVAL = 60
+# Closing auction on the GPW main market.
+SESSION_END = clock_time(17, 5)
+
+# Same attributes as a row of screener.screen, so format_hit works on both.
+Hit = namedtuple('Hit', ['company_name', 'end_day_value', 'trading_value', 'all_grow', 'streak'])
+
+
+def diff_snapshot(previous, rows):
+    """Rows whose quotes differ from the previous snapshot, keyed by company."""
+    changed = {}
+    for row in rows:
+        name = row['company_name']
+        if previous.get(name) != row:
+            changed[name] = row
+    return changed
+
+
+class IncrementalScreener:
+    """The momentum screen with the last completed sessions folded into a
+    per-company prefix, so each live tick only re-checks the companies whose
+    quotes changed.
+
+    A company is reported once per day, the first time it becomes a hit.
+    """
+
+    def __init__(self, prefixes, days=SCREEN_DAYS, trading_value_filter=TRADING_VALUE_FILTER):
+        # company -> cumulative change over the previous days - 1 sessions,
+        # present only for companies that grew and traded enough on each.
+        self.prefixes = prefixes
+        self.days = days
+        self.trading_value_filter = trading_value_filter
+        self.snapshot = {}
+        self.hits = {}
+        self.reported = set()
+
+    @classmethod
+    def from_frame(cls, frame, days=SCREEN_DAYS, trading_value_filter=TRADING_VALUE_FILTER):
+        """Build the prefixes from the quotes of the days - 1 sessions before today."""
+        prefixes = {}
+        if days > 1 and not frame.empty:
+            qualifying = frame[(frame['value_change'] > 0) & (frame['trading_value'] > trading_value_filter)]
+            grouped = qualifying.groupby('company_name')['value_change'].agg(['count', 'sum'])
+            complete = grouped[grouped['count'] == days - 1]
+            if frame['trade_date'].nunique() == days - 1:
+                prefixes = complete['sum'].to_dict()
+        return cls(prefixes, days, trading_value_filter)
+
+    @classmethod
+    def from_database(cls, session, days=SCREEN_DAYS, trading_value_filter=TRADING_VALUE_FILTER, today=None):
+        # The calendar, not the table, decides which sessions come before
+        # today, so a missing day leaves no prefixes instead of a broken streak.
+        today = today or date.today()
+        trade_dates = get_calendar().previous_sessions(days - 1, until=today - timedelta(days=1)) if days > 1 else []
+        return cls.from_frame(load_quotes_frame(session, trade_dates), days, trading_value_filter)
+
+    def evaluate(self, row):
+        prefix = self.prefixes.get(row['company_name']) if self.days > 1 else 0.0
+        if prefix is None:
+            return None
+        if not (row['value_change'] > 0 and row['trading_value'] > self.trading_value_filter
+                and row['end_day_value'] >= row['max_value']):
+            return None
+        return Hit(row['company_name'], row['end_day_value'], row['trading_value'],
+                   round(prefix + row['value_change'], 2), self.days)
+
+    def update(self, rows):
+        """Apply a live snapshot and return hits not reported before today,
+        best cumulative growth first."""
+        changed = diff_snapshot(self.snapshot, rows)
+        self.snapshot.update(changed)
+        for name, row in changed.items():
+            hit = self.evaluate(row)
+            if hit is None:
+                self.hits.pop(name, None)
+            else:
+                self.hits[name] = hit
+        new_hits = [self.hits[name] for name in changed if name in self.hits and name not in self.reported]
+        self.reported.update(hit.company_name for hit in new_hits)
+        return sorted(new_hits, key=lambda hit: hit.all_grow, reverse=True)
+
+
+def print_hits(hits):
+    for hit in hits:
+        print(format_hit(hit))
+
+
+def stream(retriever, screener, interval=POLL_INTERVAL, until=SESSION_END, polls=None, on_hits=print_hits):
+    """Poll today's quotes page until `until` (or `polls` snapshots) and pass
+    every batch of new hits to `on_hits`."""
+    today = date.today().isoformat()
+    poll = 0
+    while polls is None or poll < polls:
+        if until is not None and datetime.now().time() >= until:
+            break
+        started = time.monotonic()
+        try:
+            rows = retriever.fetch_rows(today, use_cache=False)
+        except Exception as e:
+            print(f"Error while polling quotes: {str(e)}")
+            rows = []
+        new_hits = screener.update(rows or [])
+        if new_hits:
+            on_hits(new_hits)
+        poll += 1
+        if polls is None or poll < polls:
+            time.sleep(max(0.0, interval - (time.monotonic() - started)))
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Screen live quotes during the session")
+    parser.add_argument("--interval", type=float, default=POLL_INTERVAL, help="Seconds between polls")
+    parser.add_argument("--days", type=int, default=SCREEN_DAYS, help="Growth window including today")
+    parser.add_argument("--trading-value-filter", type=int, default=TRADING_VALUE_FILTER, help="Minimum trading value")
+    parser.add_argument("--polls", type=int, default=None, help="Stop after this many polls (default: session end)")
+    args = parser.parse_args(argv)
+
+    if not get_calendar().is_session(date.today()):
+        print(f"{date.today()} is not a GPW session, nothing to stream.")
+        return
+
+    session = create_database_session()
+    try:
+        screener = IncrementalScreener.from_database(session, args.days, args.trading_value_filter)
+    finally:
+        session.close()
+    print(f"{len(screener.prefixes)} companies can complete a {args.days}-day streak today.")
+
+    dispatcher = AlertDispatcher(default_transport())
+
+    def on_hits(hits):
+        print_hits(hits)
+        dispatcher.notify(hits)
+
+    try:
+        with StockDataRetriever() as retriever:
+            stream(retriever, screener, interval=args.interval, polls=args.polls, on_hits=on_hits)
+    finally:
+        dispatcher.close(timeout=FLUSH_TIMEOUT)
+        write_metrics()
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,200 @@
+import json
+import os
+import subprocess
+import sys
+import tempfile
+import threading
+import time
+import unittest
+from datetime import date
+from http.server import BaseHTTPRequestHandler, HTTPServer
+from unittest.mock import MagicMock, patch
+
+import pandas as pd
+
+from alerts import (AlertDispatcher, FileTransport, HttpTransport, SentAlerts, TwilioTransport, default_transport,
+                    split_message)
+from streaming import Hit
+
+TODAY = date(2024, 2, 23)
+
+
+def hits(*names):
+    return [Hit(name, 10.0, 500000, 6.0, 3) for name in names]
+
+
+class TestSplitMessage(unittest.TestCase):
+
+    def test_packs_whole_lines(self):
+        self.assertEqual(split_message(['aaaa', 'bbbb', 'cccc'], max_length=9), ['aaaa\nbbbb', 'cccc'])
+
+    def test_splits_overlong_line(self):
+        self.assertEqual(split_message(['a' * 10, 'b'], max_length=4), ['aaaa', 'aaaa', 'aa\nb'])
+
+    def test_nothing_to_send(self):
+        self.assertEqual(split_message([]), [])
+
+
+class TestAlertDispatcher(unittest.TestCase):
+
+    def setUp(self):
+        self.directory = tempfile.TemporaryDirectory()
+        self.addCleanup(self.directory.cleanup)
+        self.sent_path = os.path.join(self.directory.name, 'sent.json')
+        self.transport = MagicMock()
+
+    def dispatcher(self, **kwargs):
+        return AlertDispatcher(self.transport, SentAlerts(self.sent_path), retry_delay=0, **kwargs)
+
+    def test_empty_hits_send_nothing(self):
+        with self.dispatcher() as dispatcher:
+            self.assertEqual(dispatcher.notify(pd.DataFrame(columns=Hit._fields), today=TODAY), 0)
+        self.transport.send.assert_not_called()
+
+    def test_accepts_screen_frames(self):
+        frame = pd.DataFrame(hits('Grower SA', 'Best SA'), columns=Hit._fields)
+        with self.dispatcher() as dispatcher:
+            dispatcher.notify(frame, today=TODAY)
+
+        body = self.transport.send.call_args.args[0]
+        self.assertEqual(body.count('Think to buy'), 2)
+
+    def test_batches_by_size(self):
+        with self.dispatcher(max_length=200) as dispatcher:
+            self.assertEqual(dispatcher.notify(hits(*[f'Company {i}' for i in range(5)]), today=TODAY), 3)
+
+        bodies = [call.args[0] for call in self.transport.send.call_args_list]
+        self.assertTrue(all(len(body) <= 200 for body in bodies))
+        self.assertEqual(sum(body.count('Think to buy') for body in bodies), 5)
+
+    def test_hits_are_sent_once_a_day_across_runs(self):
+        with self.dispatcher() as dispatcher:
+            dispatcher.notify(hits('Grower SA'), today=TODAY)
+            dispatcher.notify(hits('Grower SA', 'Grower SA'), today=TODAY)
+        with self.dispatcher() as dispatcher:
+            self.assertEqual(dispatcher.notify(hits('Grower SA'), today=TODAY), 0)
+            self.assertEqual(dispatcher.notify(hits('Grower SA'), today=date(2024, 2, 26)), 1)
+
+        self.assertEqual(self.transport.send.call_count, 2)
+
+    def test_retries_then_releases_failed_hits(self):
+        self.transport.send.side_effect = Exception("503")
+        with self.dispatcher(retries=3) as dispatcher:
+            dispatcher.notify(hits('Grower SA'), today=TODAY)
+
+        self.assertEqual(self.transport.send.call_count, 3)
+        self.assertEqual(SentAlerts(self.sent_path).claim(['Grower SA'], TODAY), ['Grower SA'])
+
+    def test_only_delivered_hits_are_saved(self):
+        def send(body):
+            if 'B SA' in body:
+                raise Exception("503")
+
+        self.transport.send.side_effect = send
+        with self.dispatcher(max_length=60, retries=1) as dispatcher:
+            self.assertEqual(dispatcher.notify(hits('A SA', 'B SA'), today=TODAY), 2)
+
+        with open(self.sent_path, encoding='utf-8') as sent_file:
+            self.assertEqual(json.load(sent_file)['companies'], ['A SA'])
+        self.assertEqual(SentAlerts(self.sent_path).claim(['A SA', 'B SA'], TODAY), ['B SA'])
+
+    def test_close_gives_up_when_the_queue_stays_full(self):
+        sending, release = threading.Event(), threading.Event()
+
+        def send(body):
+            sending.set()
+            release.wait(5)
+
+        self.transport.send.side_effect = send
+        self.addCleanup(release.set)
+        dispatcher = self.dispatcher(queue_size=1)
+        dispatcher.notify(hits('Grower SA'), today=TODAY)
+        self.assertTrue(sending.wait(5))
+        dispatcher.notify(hits('Best SA'), today=TODAY)
+
+        started = time.monotonic()
+        dispatcher.close(timeout=0.2)
+
+        self.assertLess(time.monotonic() - started, 2)
+
+    def test_slow_transport_does_not_block_notify(self):
+        sending, release = threading.Event(), threading.Event()
+
+        def send(body):
+            sending.set()
+            release.wait(5)
+
+        self.transport.send.side_effect = send
+        dispatcher = self.dispatcher()
+
+        dispatcher.notify(hits('Grower SA'), today=TODAY)
+        dispatcher.notify(hits('Best SA'), today=TODAY)
+
+        self.assertTrue(sending.wait(5))
+        self.assertEqual(self.transport.send.call_count, 1)
+        release.set()
+        dispatcher.close(timeout=5)
+        self.assertEqual(self.transport.send.call_count, 2)
+
+
+class TestImports(unittest.TestCase):
+
+    def test_alerts_do_not_import_pandas(self):
+        result = subprocess.run([sys.executable, '-c', "import sys, alerts; print('pandas' in sys.modules)"],
+                                capture_output=True, text=True, check=True)
+        self.assertEqual(result.stdout.strip(), 'False')
+
+
+class TestTransports(unittest.TestCase):
+
+    def test_file_transport(self):
+        with tempfile.TemporaryDirectory() as directory:
+            path = os.path.join(directory, 'alerts.txt')
+            FileTransport(path).send('first')
+            FileTransport(path).send('second')
+            with open(path, encoding='utf-8') as alerts_file:
+                self.assertEqual(alerts_file.read(), 'first\n\nsecond\n\n')
+
+    def test_http_transport(self):
+        received = []
+
+        class Handler(BaseHTTPRequestHandler):
+            def do_POST(self):
+                received.append(json.loads(self.rfile.read(int(self.headers['Content-Length']))))
+                self.send_response(204)
+                self.end_headers()
+
+            def log_message(self, *args):
+                pass
+
+        server = HTTPServer(('127.0.0.1', 0), Handler)
+        thread = threading.Thread(target=server.handle_request)
+        thread.start()
+        try:
+            status = HttpTransport(f'http://127.0.0.1:{server.server_port}/alerts').send('Think to buy')
+        finally:
+            thread.join(5)
+            server.server_close()
+
+        self.assertEqual(status, 204)
+        self.assertEqual(received, [{'body': 'Think to buy'}])
+
+    @patch.dict(os.environ, {'ALERT_TRANSPORT': 'file', 'ALERT_FILE': 'out.txt'})
+    def test_default_transport_from_environment(self):
+        transport = default_transport()
+        self.assertIsInstance(transport, FileTransport)
+        self.assertEqual(transport.path, 'out.txt')
+
+    @patch("twilio.rest.Client")
+    def test_twilio_client_is_created_on_first_send(self, mocked_client):
+        transport = TwilioTransport('sid', 'token', '+481', '+482')
+        mocked_client.assert_not_called()
+        mocked_client.return_value.messages.create.return_value.sid = 'SM1'
+
+        self.assertEqual(transport.send('body'), 'SM1')
+        mocked_client.assert_called_once_with('sid', 'token')
+        mocked_client.return_value.messages.create.assert_called_once_with(from_='+481', to='+482', body='body')
+
+
+if __name__ == '__main__':
+    unittest.main()
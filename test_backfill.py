@@ -0,0 +1,78 @@
+import unittest
+from datetime import date
+from unittest.mock import MagicMock, patch
+
+from sqlalchemy.orm import scoped_session, sessionmaker
+
+import backfill
+from models import ScrapeManifest, create_schema
+from pipeline import DONE, EMPTY, FAILED, MIN_INTERVAL
+from test_pipeline import FakePool, file_engine
+
+ROWS = [
+    {'company_name': '11 bit studios SA', 'value_change': 1.93, 'end_day_value': 580.0, 'trading_value': 2842929, 'max_value': 558.6},
+    {'company_name': '3R Games SA', 'value_change': 3.35, 'end_day_value': 0.28, 'trading_value': 36200, 'max_value': 0.27},
+]
+
+
+class TestBackfill(unittest.TestCase):
+
+    def setUp(self):
+        self.engine = file_engine(self)
+        self.Session = scoped_session(sessionmaker(bind=self.engine))
+        self.addCleanup(self.Session.remove)
+        self.retriever = MagicMock()
+        patches = [
+            patch("backfill.get_engine", return_value=self.engine),
+            patch("backfill.create_database_session", side_effect=self.Session),
+            patch("pipeline.create_database_session", side_effect=self.Session),
+            patch("pipeline.DriverPool", side_effect=lambda size, rate_limiter, page_cache: FakePool(self.retriever, size)),
+        ]
+        for patcher in patches:
+            patcher.start()
+            self.addCleanup(patcher.stop)
+
+    def manifest(self):
+        session = self.Session()
+        return {entry.trade_date: (entry.status, entry.rows) for entry in session.query(ScrapeManifest)}
+
+    def test_fetches_sessions_and_records_status(self):
+        self.retriever.fetch_rows.side_effect = [ROWS, [], RuntimeError("page did not load")]
+
+        results = backfill.run_backfill(date(2024, 2, 21), date(2024, 2, 25), min_interval=0)
+
+        self.assertEqual([call.args[0] for call in self.retriever.fetch_rows.call_args_list],
+                         ["2024-02-21", "2024-02-22", "2024-02-23"])
+        self.assertEqual([status for status, _, _ in results.values()], [DONE, EMPTY, FAILED])
+        self.assertEqual(self.manifest(), {
+            date(2024, 2, 21): (DONE, 2),
+            date(2024, 2, 22): (EMPTY, 0),
+            date(2024, 2, 23): (FAILED, 0),
+        })
+
+    def test_resumes_after_completed_dates(self):
+        with self.engine.begin() as connection:
+            create_schema(connection)
+        backfill.record_status(self.Session(), date(2024, 2, 21), DONE, rows=410)
+        backfill.record_status(self.Session(), date(2024, 2, 22), FAILED, rows=0)
+        self.retriever.fetch_rows.return_value = ROWS
+
+        backfill.run_backfill(date(2024, 2, 21), date(2024, 2, 23), min_interval=0)
+
+        self.assertEqual([call.args[0] for call in self.retriever.fetch_rows.call_args_list],
+                         ["2024-02-22", "2024-02-23"])
+        self.assertEqual(self.manifest()[date(2024, 2, 22)], (DONE, 2))
+
+    def test_nothing_pending(self):
+        self.assertEqual(backfill.run_backfill(date(2024, 2, 24), date(2024, 2, 25)), {})
+        self.retriever.fetch_rows.assert_not_called()
+
+    def test_command_line_arguments(self):
+        with patch("backfill.run_backfill") as mocked_run, patch.dict("os.environ", {}, clear=True):
+            backfill.main(["--from", "2024-01-02", "--to", "2024-01-31", "--drivers", "3"])
+
+        mocked_run.assert_called_once_with(date(2024, 1, 2), date(2024, 1, 31), drivers=3, min_interval=MIN_INTERVAL, page_cache=None)
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,78 @@
+import unittest
+from datetime import date
+
+import numpy as np
+
+from backtest import build_matrix, evaluate, forward_returns, parameter_grid, signal_events, signals, sweep
+from screener import screen
+from test_screener import DATES, quotes_frame, screener_rows
+
+LATER = [date(2024, 2, 26), date(2024, 2, 27)]
+
+
+def history_rows():
+    rows = screener_rows()
+    for trade_date, close in zip(LATER, [11.0, 9.0]):
+        rows.append((trade_date, 'Grower SA', 1.0, close, 500000, 9.5))
+        rows.append((trade_date, 'Best SA', 1.0, 22.0, 800000, 19.0))
+    return rows
+
+
+class TestBacktest(unittest.TestCase):
+
+    def setUp(self):
+        self.frame = quotes_frame(history_rows())
+        self.matrix = build_matrix(self.frame)
+
+    def hits_on(self, signal, trade_date):
+        column = list(self.matrix.trade_dates).index(trade_date)
+        return set(self.matrix.companies[signal[:, column]])
+
+    def test_signals_match_screen_on_each_day(self):
+        signal = signals(self.matrix, days=3)
+        for end in range(3, len(self.matrix.trade_dates) + 1):
+            window = set(self.matrix.trade_dates[end - 3:end])
+            expected = set(screen(self.frame[self.frame['trade_date'].isin(window)], days=3)['company_name'])
+            self.assertEqual(self.hits_on(signal, self.matrix.trade_dates[end - 1]), expected)
+
+    def test_value_adjustment_is_applied_to_raw_max(self):
+        # Below Max SA closes at 10 against a stored (adjusted) max of 11.
+        signal = signals(self.matrix, days=3, value_adjustment=0.8)
+        self.assertIn('Below Max SA', self.hits_on(signal, DATES[2]))
+
+    def test_forward_returns(self):
+        close = np.array([[10.0, 11.0, np.nan, 12.1]])
+        np.testing.assert_allclose(forward_returns(close, 1), [[0.1, np.nan, np.nan, np.nan]])
+        np.testing.assert_allclose(forward_returns(close, 3), [[0.21, np.nan, np.nan, np.nan]])
+
+    def test_evaluate_reports_returns_and_hit_rate(self):
+        result = evaluate(self.matrix, days=3, horizons=(1, 2))
+
+        # Best SA and Grower SA fire on the 23rd and 26th, Best SA again on the 27th.
+        self.assertEqual(result['signals'], 5)
+        self.assertAlmostEqual(result['mean_return_1d'], np.mean([0.1, 0.1, 0.0, 9 / 11 - 1]))
+        self.assertEqual(result['hit_rate_1d'], 0.5)
+        self.assertEqual(result['hit_rate_2d'], 0.5)
+
+    def test_signal_events(self):
+        events = signal_events(self.matrix, days=3, horizons=(1,))
+
+        self.assertEqual(list(events['company_name'][:2]), ['Best SA', 'Grower SA'])
+        self.assertEqual(list(events['trade_date'][:2]), [DATES[2], DATES[2]])
+        self.assertAlmostEqual(events['return_1d'][1], 0.1)
+
+    def test_parallel_sweep_matches_serial(self):
+        grid = parameter_grid(days=(1, 2, 3), value_adjustments=(0.8, 0.95), trading_value_filters=(0, 100000))
+
+        serial = sweep(self.matrix, grid, workers=1)
+        parallel = sweep(self.matrix, grid, workers=2)
+
+        self.assertEqual(len(serial), 12)
+        self.assertTrue(serial.equals(parallel))
+
+    def test_window_longer_than_history(self):
+        self.assertEqual(evaluate(self.matrix, days=10)['signals'], 0)
+
+
+if __name__ == '__main__':
+    unittest.main()
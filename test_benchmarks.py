@@ -0,0 +1,63 @@
+import os
+import tempfile
+import unittest
+
+from benchmarks.run import build_stages, compare, format_report, load_baseline, main, measure, save_baseline
+from benchmarks.synthetic import synthetic_history
+
+
+def result(seconds, peak_kib=100.0, rows=410):
+    return {'seconds': seconds, 'rows': rows, 'rows_per_second': rows / seconds, 'peak_kib': peak_kib}
+
+
+class TestSyntheticHistory(unittest.TestCase):
+
+    def test_one_row_per_company_and_session(self):
+        history = synthetic_history(companies=3, sessions=5)
+
+        self.assertEqual(len(history), 15)
+        self.assertEqual(history.groupby('company_name')['trade_date'].nunique().tolist(), [5, 5, 5])
+        self.assertTrue(history.equals(synthetic_history(companies=3, sessions=5)))
+
+
+class TestBenchmarks(unittest.TestCase):
+
+    def test_every_stage_runs(self):
+        stages = build_stages(companies=5, sessions=10, insert_days=2)
+        results = {stage.name: measure(stage, repeat=1) for stage in stages}
+
+        self.assertEqual(results['parse_page']['rows'], 410)
+        self.assertEqual(results['store_rows']['rows'], 820)
+        self.assertEqual(results['backtest_evaluate']['rows'], 50)
+        self.assertTrue(all(stage['seconds'] > 0 and stage['peak_kib'] > 0 for stage in results.values()))
+
+    def test_compare_flags_slower_and_larger_stages(self):
+        baseline = {'parse_page': result(0.040), 'store_rows': result(0.150)}
+        results = {'parse_page': result(0.060), 'store_rows': result(0.155, peak_kib=200.0), 'new_stage': result(1.0)}
+
+        regressions = compare(results, baseline, tolerance=0.25)
+
+        self.assertEqual(len(regressions), 2)
+        self.assertTrue(regressions[0].startswith('parse_page: seconds'))
+        self.assertTrue(regressions[1].startswith('store_rows: peak_kib'))
+
+    def test_report_shows_change_against_baseline(self):
+        report = format_report({'parse_page': result(0.030)}, {'parse_page': result(0.040)})
+
+        self.assertIn('-25%', report.splitlines()[1])
+
+    def test_baseline_round_trip_and_regression_exit(self):
+        with tempfile.TemporaryDirectory() as directory:
+            path = os.path.join(directory, 'baseline.json')
+            save_baseline(path, {'extract_cells': result(1e-9, peak_kib=1e-9)})
+            self.assertEqual(load_baseline(path)['extract_cells']['seconds'], 1e-9)
+
+            with self.assertRaises(SystemExit):
+                main(['--repeat', '1', '--companies', '2', '--sessions', '3', '--stage', 'extract_cells',
+                      '--baseline', path, '--output', os.path.join(directory, 'report.txt')])
+            with open(os.path.join(directory, 'report.txt'), encoding='utf-8') as report:
+                self.assertIn('Regressions:', report.read())
+
+
+if __name__ == '__main__':
+    unittest.main()
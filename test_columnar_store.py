@@ -0,0 +1,54 @@
+import os
+import tempfile
+import unittest
+from datetime import date
+
+import pyarrow.parquet as pq
+
+from columnar_store import (QUOTE_SCHEMA, archive_trade_dates, export_range, read_quotes, read_quotes_frame,
+                            screen_archive)
+from screener import load_quotes_frame, screen
+from test_screener import DATES, screener_rows, stored_session
+
+
+class TestColumnarStore(unittest.TestCase):
+
+    def setUp(self):
+        self.directory = tempfile.TemporaryDirectory()
+        self.addCleanup(self.directory.cleanup)
+        self.session = stored_session(screener_rows() + [(date(2024, 3, 1), 'Grower SA', 1.0, 10.0, 500000, 9.5)])
+        self.addCleanup(self.session.close)
+        self.paths = export_range(self.session, self.directory.name, date(2024, 2, 1), date(2024, 3, 31))
+
+    def test_one_typed_file_per_month(self):
+        self.assertEqual([os.path.basename(path) for path in self.paths],
+                         ["quotes_2024_02.parquet", "quotes_2024_03.parquet"])
+        self.assertEqual(pq.read_schema(self.paths[0]).remove_metadata(), QUOTE_SCHEMA)
+
+    def test_read_range(self):
+        table = read_quotes(self.directory.name, date(2024, 2, 22), date(2024, 3, 31))
+
+        self.assertEqual(sorted(set(table['trade_date'].to_pylist())), [DATES[1], DATES[2], date(2024, 3, 1)])
+
+    def test_empty_archive(self):
+        with tempfile.TemporaryDirectory() as directory:
+            self.assertEqual(read_quotes(directory).num_rows, 0)
+            self.assertTrue(screen_archive(directory).empty)
+
+    def test_archive_trade_dates(self):
+        self.assertEqual(archive_trade_dates(self.directory.name, until=date(2024, 2, 29)), DATES)
+
+    def test_frame_matches_database(self):
+        frame = read_quotes_frame(self.directory.name, DATES[0], DATES[-1])
+        expected = load_quotes_frame(self.session, DATES)
+
+        self.assertEqual(screen(frame).to_dict('list'), screen(expected).to_dict('list'))
+
+    def test_screen_archive(self):
+        hits = screen_archive(self.directory.name, days=3, until=date(2024, 2, 29))
+
+        self.assertEqual(list(hits['company_name']), ['Best SA', 'Grower SA'])
+
+
+if __name__ == "__main__":
+    unittest.main()
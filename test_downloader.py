@@ -1,37 +1,43 @@
 import os
 import io
+import re
+import threading
 import unittest
-from unittest.mock import patch
-from downloader import StockDataRetriever, main
+from datetime import date, datetime
+from unittest.mock import MagicMock, patch
+from downloader import MAX_STALE_RETRIES, QUOTES_TABLE_SCRIPT, IncompleteTableError, StockDataRetriever, DriverPool, backfill, backfill_range, is_date_stored, main, quotes_table_ready, store_rows, stored_row_count
+from metrics import metrics
+from models import Quote, create_schema
+from page_parser import QUOTE_COLUMNS
+from selenium.common.exceptions import StaleElementReferenceException
 from sqlalchemy import create_engine, inspect, Column, String, Integer, Float, exc
 from sqlalchemy.orm import declarative_base, sessionmaker
-from sqlalchemy_utils import database_exists, create_database
-from selenium import webdriver
-from selenium.webdriver.common.by import By
-from selenium.webdriver.common.keys import Keys
-from selenium.webdriver.chrome.service import Service
-from selenium.webdriver.chrome.options import Options
-from selenium.common.exceptions import NoSuchElementException
-
-postgres_username = os.environ['POSTGRES_USERNAME']
-postgres_password = os.environ.get('POSTGRES_PASSWORD')
-postgres_host = os.environ['POSTGRES_HOST']
-postgres_dbname = os.environ['POSTGRES_DB']
+from sqlalchemy.pool import StaticPool
 
 Base = declarative_base()
 URL = "https://www.money.pl/gielda/gpw/akcje/?date=2024-02-23"
 PAGE_NAME = "NotowaniaGPW.htm"
+TRADE_DATE = date(2024, 2, 23)
 
 
 class TestRetrieveStockData(unittest.TestCase):
 
-    @patch("downloader.webdriver.Chrome")
-    def setUp(self, mocked_driver):
+    def setUp(self):
+        # Chrome and the database stay mocked for the whole test, so neither a
+        # browser nor credentials are needed.
+        self.mocked_driver = self.start_patch("selenium.webdriver.Chrome").return_value
+        self.mocked_driver.execute_script.return_value = []
+        self.start_patch("downloader.create_database_session")
+        self.start_patch("downloader.stored_row_count", return_value=0)
+        self.start_patch("downloader.StockDataRetriever.wait_for_quotes_table", return_value=0)
         self.retriever = StockDataRetriever()
-        self.mocked_driver = mocked_driver.return_value
 
-    @patch("downloader.webdriver.Chrome")
-    def test_retrieve_stock_data_parses_date_correctly(self, mocked_driver):
+    def start_patch(self, target, **kwargs):
+        patcher = patch(target, **kwargs)
+        self.addCleanup(patcher.stop)
+        return patcher.start()
+
+    def test_retrieve_stock_data_parses_date_correctly(self):
         chosen_date = "2024-02-23"
         
         self.retriever.retrieve_stock_data(chosen_date)
@@ -39,8 +45,7 @@ class TestRetrieveStockData(unittest.TestCase):
         self.mocked_driver.get.assert_called_once_with(f"https://www.money.pl/gielda/gpw/akcje/?date={chosen_date}")
 
         
-    @patch("downloader.webdriver.Chrome")
-    def test_retrieve_stock_data_builds_correct_url(self, mocked_driver):
+    def test_retrieve_stock_data_builds_correct_url(self):
         chosen_date = "2024-02-23"
         expected_url = f"https://www.money.pl/gielda/gpw/akcje/?date={chosen_date}"
         
@@ -51,13 +56,13 @@ class TestRetrieveStockData(unittest.TestCase):
     
     def test_parse_correct_date_format(self):
         chosen_date = "2024-02-23"
-        expected_parsed_date = "2024-02-23"
+        expected_parsed_date = datetime(2024, 2, 23)
         parsed_date = self.retriever.parse_date(chosen_date)
         self.assertEqual(parsed_date, expected_parsed_date)
 
-    def test_parse_incorrect_date_format(self):
+    def test_parse_underscored_date_format(self):
         chosen_date = "2024_02_23"
-        expected_parsed_date = "2024-02-23"
+        expected_parsed_date = datetime(2024, 2, 23)
         parsed_date = self.retriever.parse_date(chosen_date)
         self.assertEqual(parsed_date, expected_parsed_date)
 
@@ -72,12 +77,425 @@ class TestRetrieveStockData(unittest.TestCase):
         self.assertIsNone(parsed_date)
 
     def test_parse_other_exceptions(self):
-        chosen_date = "2024_02_23"
+        chosen_date = None
         parsed_date = self.retriever.parse_date(chosen_date)
         self.assertIsNone(parsed_date)
         
 
 
+class TestDriverPool(unittest.TestCase):
+
+    def setUp(self):
+        patches = [
+            patch("pipeline.create_database_session"),
+            patch("pipeline.stored_row_count", return_value=0),
+            patch("pipeline.RateLimiter.wait"),
+            patch("downloader.default_page_cache", return_value=None),
+        ]
+        for patcher in patches:
+            patcher.start()
+            self.addCleanup(patcher.stop)
+        self.store_rows = self.start_patch("pipeline.store_rows", side_effect=lambda session, trade_date, rows: len(rows))
+        self.fetch_rows = self.start_patch("downloader.StockDataRetriever.fetch_rows", return_value=BULK_ROWS)
+        self.driver = self.start_patch("selenium.webdriver.Chrome")
+
+    def start_patch(self, target, **kwargs):
+        patcher = patch(target, **kwargs)
+        self.addCleanup(patcher.stop)
+        return patcher.start()
+
+    def test_backfill_reuses_drivers_across_dates(self):
+        dates = ["2024-02-21", "2024-02-22", "2024-02-23"]
+
+        results = backfill(dates, drivers=2)
+
+        self.assertEqual(self.driver.call_count, 2)
+        self.assertEqual(self.fetch_rows.call_count, 3)
+        self.assertEqual(results, {date: True for date in dates})
+        self.assertEqual(self.driver.return_value.quit.call_count, 2)
+
+    def test_backfill_stores_from_a_single_writer_thread(self):
+        writers = set()
+        self.store_rows.side_effect = lambda session, trade_date, rows: writers.add(threading.current_thread()) or len(rows)
+
+        backfill(["2024-02-21", "2024-02-22", "2024-02-23"], drivers=3)
+
+        self.assertEqual(self.store_rows.call_count, 3)
+        self.assertEqual(len(writers), 1)
+
+    def test_backfill_reports_failed_dates(self):
+        def fetch_rows(chosen_date):
+            if chosen_date == "2024-02-23":
+                raise RuntimeError("page did not load")
+            return BULK_ROWS
+
+        self.fetch_rows.side_effect = fetch_rows
+
+        results = backfill(["2024-02-22", "2024-02-23"])
+
+        self.assertEqual(self.driver.call_count, 1)
+        self.assertEqual(results, {"2024-02-22": True, "2024-02-23": False})
+
+    def test_backfill_without_dates_starts_no_driver(self):
+        self.assertEqual(backfill([]), {})
+        self.driver.assert_not_called()
+
+    def test_backfill_skips_non_session_dates(self):
+        results = backfill(["2024-02-24", "2024-03-29", "2024-04-02", "not a date"])
+
+        self.assertEqual(results, {"2024-04-02": True})
+
+    def test_backfill_range_covers_sessions_only(self):
+        results = backfill_range(date(2024, 3, 28), date(2024, 4, 3), drivers=2)
+
+        self.assertEqual(list(results), ["2024-03-28", "2024-04-02", "2024-04-03"])
+
+
+class TestCookies(unittest.TestCase):
+
+    @patch("selenium.webdriver.support.ui.WebDriverWait")
+    @patch("selenium.webdriver.Chrome")
+    def test_cookies_accepted_once_per_session(self, mocked_driver, mocked_wait):
+        cookie_button = MagicMock()
+        mocked_driver.return_value.find_elements.return_value = [cookie_button]
+        retriever = StockDataRetriever()
+
+        retriever.accept_cookies()
+        retriever.accept_cookies()
+
+        self.assertEqual(cookie_button.click.call_count, 1)
+        self.assertEqual(mocked_wait.call_count, 1)
+
+    @patch("selenium.webdriver.support.ui.WebDriverWait")
+    @patch("selenium.webdriver.Chrome")
+    def test_missing_cookie_banner_is_not_clicked(self, mocked_driver, mocked_wait):
+        mocked_driver.return_value.find_elements.return_value = []
+        retriever = StockDataRetriever()
+
+        retriever.accept_cookies()
+
+        self.assertFalse(retriever.cookies_accepted)
+
+
+class TestPageCacheLookup(unittest.TestCase):
+
+    @patch("selenium.webdriver.Chrome")
+    def test_cached_page_does_not_start_chrome(self, mocked_driver):
+        page_cache = MagicMock()
+        with open(PAGE_NAME, encoding='utf-8') as html_file:
+            page_cache.get.return_value = html_file.read()
+        page_cache.row_count.return_value = 410
+        retriever = StockDataRetriever(page_cache=page_cache)
+
+        rows = retriever.fetch_rows("2024-02-23")
+
+        self.assertEqual(len(rows), 410)
+        page_cache.get.assert_called_once_with(TRADE_DATE)
+        mocked_driver.assert_not_called()
+
+    @patch("selenium.webdriver.Chrome")
+    def test_pool_with_cache_starts_no_driver_up_front(self, mocked_driver):
+        with DriverPool(size=2, page_cache=MagicMock()):
+            mocked_driver.assert_not_called()
+
+
+BULK_TABLE = [
+    ['11 bit studios SA', '1,93', '580,00', '2 842 929', '588,00'],
+    ['3R Games SA', '3,35', '0,28', '36 200', '0,28'],
+]
+BULK_ROWS = [
+    {'company_name': '11 bit studios SA', 'value_change': 1.93, 'end_day_value': 580.0, 'trading_value': 2842929.0, 'max_value': 558.6},
+    {'company_name': '3R Games SA', 'value_change': 3.35, 'end_day_value': 0.28, 'trading_value': 36200.0, 'max_value': 0.27},
+]
+
+
+def quotes_page(table):
+    """Markup parse_quotes_html reads back as `table`."""
+    groups = []
+    for row in table:
+        cells = [''] * 8
+        for column, text in zip(QUOTE_COLUMNS, row):
+            cells[column] = text
+        groups.append('<div class="rt-tr-group"><div class="rt-tr">'
+                      + ''.join(f'<div class="rt-td">{text}</div>' for text in cells) + '</div></div>')
+    return f'<div class="rt-tbody">{"".join(groups)}</div>'
+
+
+class TestExtractionFallback(unittest.TestCase):
+
+    def setUp(self):
+        metrics.reset()
+        self.addCleanup(metrics.reset)
+        patcher = patch("selenium.webdriver.Chrome")
+        self.addCleanup(patcher.stop)
+        self.driver = patcher.start().return_value
+        self.driver.page_source = ""
+        self.retriever = StockDataRetriever()
+        self.retriever.accept_cookies = MagicMock()
+        self.retriever.wait_for_quotes_table = MagicMock(return_value=len(BULK_TABLE))
+        self.retriever.extract_rows_per_row = MagicMock(return_value=(BULK_ROWS, 0))
+
+    def source(self):
+        return next(name[len('pages_'):] for name in metrics.snapshot()['counters'] if name.startswith('pages_'))
+
+    def test_script_reads_the_parser_columns(self):
+        self.assertEqual(tuple(int(index) for index in re.findall(r"text\((\d)\)", QUOTES_TABLE_SCRIPT)), QUOTE_COLUMNS)
+
+    def test_complete_bulk_table_is_used(self):
+        self.driver.execute_script.return_value = BULK_TABLE
+
+        rows = self.retriever.fetch_rows("2024-02-23")
+
+        self.assertEqual(rows, BULK_ROWS)
+        self.assertEqual(self.source(), 'bulk')
+        self.driver.execute_script.assert_called_once_with(QUOTES_TABLE_SCRIPT)
+        self.retriever.extract_rows_per_row.assert_not_called()
+
+    def test_short_bulk_table_falls_back_to_page_source(self):
+        self.driver.execute_script.return_value = BULK_TABLE[:1]
+        with open(PAGE_NAME, encoding='utf-8') as html_file:
+            self.driver.page_source = html_file.read()
+
+        rows = self.retriever.fetch_rows("2024-02-23")
+
+        self.assertEqual(len(rows), 410)
+        self.assertEqual(self.source(), 'page_source')
+        self.retriever.extract_rows_per_row.assert_not_called()
+
+    def test_failing_bulk_passes_fall_back_to_per_row(self):
+        self.driver.execute_script.side_effect = Exception("javascript error")
+
+        rows = self.retriever.fetch_rows("2024-02-23")
+
+        self.assertEqual(rows, BULK_ROWS)
+        self.assertEqual(self.source(), 'per_row')
+        self.retriever.extract_rows_per_row.assert_called_once_with(len(BULK_TABLE))
+
+    def test_short_extraction_is_refused(self):
+        page_cache = MagicMock()
+        page_cache.get.return_value = None
+        self.retriever.page_cache = page_cache
+        self.driver.execute_script.return_value = BULK_TABLE[:1]
+        self.retriever.extract_rows_per_row.return_value = (BULK_ROWS[:1], 0)
+
+        with self.assertRaises(IncompleteTableError):
+            self.retriever.fetch_rows("2024-02-23")
+        page_cache.put.assert_not_called()
+        self.assertEqual(metrics.snapshot()['counters']['pages_incomplete'], 1)
+
+    def test_unparseable_rows_are_skipped_not_refused(self):
+        self.driver.execute_script.return_value = BULK_TABLE + [['Bad Cell SA', '1,00', '2,00', '', '2,00']]
+        self.retriever.wait_for_quotes_table.return_value = len(BULK_TABLE) + 1
+
+        rows = self.retriever.fetch_rows("2024-02-23")
+
+        self.assertEqual(rows, BULK_ROWS)
+        self.assertEqual(self.source(), 'bulk')
+        self.retriever.extract_rows_per_row.assert_not_called()
+
+    def test_unparseable_rows_are_counted_once(self):
+        bad_row = ['Bad Cell SA', '1,00', '2,00', '', '2,00']
+        self.driver.execute_script.return_value = BULK_TABLE[:1] + [bad_row]
+        self.driver.page_source = quotes_page(BULK_TABLE + [bad_row])
+        self.retriever.wait_for_quotes_table.return_value = len(BULK_TABLE) + 1
+
+        rows = self.retriever.fetch_rows("2024-02-23")
+
+        self.assertEqual(rows, BULK_ROWS)
+        self.assertEqual(self.source(), 'page_source')
+        self.assertEqual(metrics.snapshot()['counters']['rows_failed'], 1)
+
+    def test_unparseable_rows_are_skipped_by_per_row_extraction(self):
+        cells = [MagicMock(text=text) for text in ['Bad Cell SA', '1,00', '2,00', '', '2,00']]
+        self.driver.find_element.side_effect = cells
+
+        self.assertEqual(StockDataRetriever().extract_rows_per_row(1), ([], 1))
+
+    def cached(self, html=None, row_count=None):
+        page_cache = MagicMock()
+        page_cache.get.return_value = html
+        page_cache.row_count.return_value = row_count
+        self.retriever.page_cache = page_cache
+        return page_cache
+
+    def test_short_cached_page_is_downloaded_again(self):
+        with open(PAGE_NAME, encoding='utf-8') as html_file:
+            self.cached(html_file.read(), row_count=411)
+        self.driver.execute_script.return_value = BULK_TABLE
+
+        self.assertEqual(self.retriever.fetch_rows("2024-02-23"), BULK_ROWS)
+        self.assertEqual(self.source(), 'bulk')
+
+    def test_page_is_cached_with_its_row_count(self):
+        page_cache = self.cached()
+        self.driver.execute_script.return_value = BULK_TABLE
+        self.driver.page_source = quotes_page(BULK_TABLE)
+
+        self.retriever.fetch_rows("2024-02-23")
+
+        page_cache.put.assert_called_once_with(TRADE_DATE, self.driver.page_source, rows=len(BULK_TABLE))
+
+    def test_page_the_parser_reads_short_is_not_cached(self):
+        page_cache = self.cached()
+        self.driver.execute_script.return_value = BULK_TABLE
+        self.driver.page_source = quotes_page(BULK_TABLE[:1])
+
+        self.assertEqual(self.retriever.fetch_rows("2024-02-23"), BULK_ROWS)
+        page_cache.put.assert_not_called()
+
+    def test_todays_page_is_not_cached(self):
+        page_cache = self.cached()
+        self.driver.execute_script.return_value = BULK_TABLE
+        self.driver.page_source = quotes_page(BULK_TABLE)
+
+        self.retriever.fetch_rows(date.today().isoformat())
+
+        page_cache.get.assert_not_called()
+        page_cache.put.assert_not_called()
+
+    def test_unsettled_table_is_refused(self):
+        self.retriever.wait_for_quotes_table.side_effect = Exception("timeout")
+
+        with self.assertRaises(IncompleteTableError):
+            self.retriever.fetch_rows("2024-02-23")
+        self.driver.execute_script.assert_not_called()
+
+    @patch("downloader.store_rows")
+    @patch("downloader.stored_row_count", return_value=0)
+    @patch("downloader.create_database_session")
+    def test_partial_day_is_not_stored(self, mocked_session, mocked_count, mocked_store):
+        self.driver.execute_script.side_effect = Exception("javascript error")
+        self.retriever.extract_rows_per_row.return_value = (BULK_ROWS[:1], 0)
+
+        with self.assertRaises(IncompleteTableError):
+            self.retriever.retrieve_stock_data("2024-02-23")
+        mocked_store.assert_not_called()
+
+    def test_bulk_extraction_can_be_disabled(self):
+        self.retriever.bulk_extraction = False
+
+        self.retriever.fetch_rows("2024-02-23")
+
+        self.driver.execute_script.assert_not_called()
+        self.retriever.extract_rows_per_row.assert_called_once_with(len(BULK_TABLE))
+
+
+class TestInstrumentation(unittest.TestCase):
+
+    def setUp(self):
+        metrics.reset()
+        self.addCleanup(metrics.reset)
+
+    def test_fetch_records_source_and_rows(self):
+        page_cache = MagicMock()
+        with open(PAGE_NAME, encoding='utf-8') as html_file:
+            page_cache.get.return_value = html_file.read()
+        page_cache.row_count.return_value = 410
+
+        StockDataRetriever(page_cache=page_cache).fetch_rows("2024-02-23")
+
+        snapshot = metrics.snapshot()
+        self.assertEqual(snapshot['counters']['pages_cached'], 1)
+        self.assertEqual(snapshot['counters']['rows_parsed'], 410)
+        self.assertEqual(snapshot['timers']['fetch']['count'], 1)
+
+    @patch("selenium.webdriver.Chrome")
+    def test_stale_rows_are_retried_a_limited_number_of_times(self, mocked_driver):
+        mocked_driver.return_value.find_element.side_effect = StaleElementReferenceException()
+
+        rows, unparsed = StockDataRetriever().extract_rows_per_row(2)
+
+        self.assertEqual((rows, unparsed), ([], 0))
+        counters = metrics.snapshot()['counters']
+        self.assertEqual(counters['stale_retries'], 2 * (MAX_STALE_RETRIES + 1))
+
+    @patch("selenium.webdriver.Chrome")
+    def test_stale_row_recovers_on_retry(self, mocked_driver):
+        cell = MagicMock(text='1,00')
+        mocked_driver.return_value.find_element.side_effect = [StaleElementReferenceException()] + [cell] * 5
+
+        rows, _ = StockDataRetriever().extract_rows_per_row(1)
+
+        self.assertEqual(len(rows), 1)
+        self.assertEqual(metrics.snapshot()['counters'], {'stale_retries': 1})
+
+
+class TestQuotesTableReady(unittest.TestCase):
+
+    def test_waits_until_row_count_is_stable_and_populated(self):
+        driver = MagicMock()
+        driver.execute_script.side_effect = [[0, 0], [0, 0], [380, 380], [410, 402], [410, 410]]
+        condition = quotes_table_ready()
+
+        self.assertEqual([condition(driver) for _ in range(5)], [False, False, False, False, 410])
+
+
+class TestStoreRows(unittest.TestCase):
+
+    def setUp(self):
+        engine = create_engine("sqlite://", poolclass=StaticPool)
+        self.session = sessionmaker(bind=engine)()
+
+    def tearDown(self):
+        self.session.close()
+
+    def test_date_not_stored_before_schema_exists(self):
+        self.assertFalse(is_date_stored(self.session, TRADE_DATE))
+
+    def test_inserts_all_rows_in_one_transaction(self):
+        rows = [
+            {'company_name': '11 bit studios SA', 'value_change': 1.93, 'end_day_value': 580.0, 'trading_value': 2842929, 'max_value': 558.6},
+            {'company_name': '3R Games SA', 'value_change': 3.35, 'end_day_value': 0.28, 'trading_value': 36200, 'max_value': 0.27},
+        ]
+
+        self.assertEqual(store_rows(self.session, TRADE_DATE, rows), 2)
+        self.assertTrue(is_date_stored(self.session, TRADE_DATE))
+        self.assertEqual(self.session.query(Quote).filter(Quote.trade_date == TRADE_DATE).count(), 2)
+
+    def test_schema_is_inspected_once_per_engine(self):
+        rows = [{'company_name': '3R Games SA', 'value_change': 3.35, 'end_day_value': 0.28, 'trading_value': 36200, 'max_value': 0.27}]
+        store_rows(self.session, TRADE_DATE, rows)
+
+        with patch("downloader.inspect", wraps=inspect) as mocked_inspect:
+            counts = [stored_row_count(self.session, TRADE_DATE) for _ in range(3)]
+
+        self.assertEqual(counts, [1, 1, 1])
+        self.assertEqual(mocked_inspect.call_count, 1)
+
+    def test_schema_is_created_once_per_engine(self):
+        rows = [{'company_name': '3R Games SA', 'value_change': 3.35, 'end_day_value': 0.28, 'trading_value': 36200, 'max_value': 0.27}]
+
+        with patch("downloader.create_schema", wraps=create_schema) as mocked_create_schema:
+            for trade_date in (date(2024, 2, 21), date(2024, 2, 22), TRADE_DATE):
+                store_rows(self.session, trade_date, rows)
+
+        self.assertEqual(mocked_create_schema.call_count, 1)
+        self.assertEqual(self.session.query(Quote).count(), 3)
+
+    def test_failed_write_rolls_back_every_row(self):
+        rows = [
+            {'company_name': '11 bit studios SA', 'value_change': 1.93, 'end_day_value': 580.0, 'trading_value': 2842929, 'max_value': 558.6},
+            {'company_name': None, 'value_change': 3.35, 'end_day_value': 0.28, 'trading_value': 36200, 'max_value': 0.27},
+        ]
+
+        with self.assertRaises(exc.IntegrityError):
+            store_rows(self.session, TRADE_DATE, rows)
+        self.assertFalse(is_date_stored(self.session, TRADE_DATE))
+
+    def test_transactions_are_timed(self):
+        metrics.reset()
+        self.addCleanup(metrics.reset)
+        rows = [{'company_name': '3R Games SA', 'value_change': 3.35, 'end_day_value': 0.28, 'trading_value': 36200, 'max_value': 0.27}]
+
+        store_rows(self.session, TRADE_DATE, rows)
+        with self.assertRaises(exc.IntegrityError):
+            store_rows(self.session, TRADE_DATE, rows)
+
+        snapshot = metrics.snapshot()
+        self.assertEqual(snapshot['timers']['db_transaction']['count'], 2)
+        self.assertEqual(snapshot['counters'], {'rows_stored': 1, 'db_transactions_failed': 1})
+
+
 
 if __name__ == "__main__":
     unittest.main()
@@ -0,0 +1,41 @@
+import unittest
+from unittest.mock import MagicMock, patch
+
+from sqlalchemy import create_engine
+from sqlalchemy.orm import sessionmaker
+
+import main_file
+from test_screener import DATES, screener_rows, stored_session
+
+
+class TestMainFile(unittest.TestCase):
+
+    def setUp(self):
+        engine = create_engine("sqlite://")
+        self.session = sessionmaker(bind=engine)()
+        self.addCleanup(self.session.close)
+
+    def test_missing_dates_without_quotes_table(self):
+        self.assertEqual(main_file.missing_trade_dates(self.session, DATES), ["2024_02_21", "2024_02_22", "2024_02_23"])
+
+    @patch("main_file.AlertDispatcher")
+    @patch("main_file.backfill")
+    def test_run_downloads_missing_dates_and_alerts_hits(self, mocked_backfill, mocked_dispatcher):
+        session = stored_session([row for row in screener_rows() if row[0] != DATES[2]])
+        self.addCleanup(session.close)
+        calendar = MagicMock()
+        calendar.previous_sessions.return_value = DATES
+
+        with patch("main_file.create_database_session", return_value=session), \
+                patch("main_file.get_calendar", return_value=calendar), \
+                patch("main_file.default_transport"):
+            main_file.run()
+
+        mocked_backfill.assert_called_once_with(["2024_02_23"])
+        dispatcher = mocked_dispatcher.return_value
+        dispatcher.notify.assert_called_once()
+        dispatcher.close.assert_called_once_with(timeout=main_file.FLUSH_TIMEOUT)
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,85 @@
+import json
+import os
+import tempfile
+import unittest
+from unittest.mock import patch
+
+from metrics import Metrics, log_event, metrics, write_metrics
+
+
+class TestMetrics(unittest.TestCase):
+
+    def setUp(self):
+        self.metrics = Metrics()
+
+    def test_counters_and_timers(self):
+        self.metrics.increment('rows_parsed', 410)
+        self.metrics.increment('rows_parsed')
+        with self.metrics.timer('page_load'):
+            pass
+        self.metrics.observe('page_load', 1.5)
+
+        snapshot = self.metrics.snapshot()
+        self.assertEqual(snapshot['counters'], {'rows_parsed': 411})
+        self.assertEqual(snapshot['timers']['page_load']['count'], 2)
+        self.assertGreaterEqual(snapshot['timers']['page_load']['seconds'], 1.5)
+
+    def test_timer_records_failed_stages(self):
+        with self.assertRaises(RuntimeError):
+            with self.metrics.timer('db_transaction'):
+                raise RuntimeError("connection lost")
+
+        self.assertEqual(self.metrics.snapshot()['timers']['db_transaction']['count'], 1)
+
+    def test_prometheus_format(self):
+        self.metrics.increment('rows_failed', 2)
+        self.metrics.observe('wait_table', 0.25)
+
+        self.assertEqual(self.metrics.prometheus(), '\n'.join([
+            '# TYPE gpw_rows_failed_total counter',
+            'gpw_rows_failed_total 2',
+            '# TYPE gpw_stage_seconds summary',
+            'gpw_stage_seconds_sum{stage="wait_table"} 0.25',
+            'gpw_stage_seconds_count{stage="wait_table"} 1',
+        ]) + '\n')
+
+    def test_summary_lists_slowest_stage_first(self):
+        self.metrics.observe('screen', 0.1)
+        self.metrics.observe('page_load', 2.0)
+
+        self.assertTrue(self.metrics.summary().startswith('Stages: page_load 2.0s/1, screen 0.1s/1.'))
+
+
+class TestWriteMetrics(unittest.TestCase):
+
+    def setUp(self):
+        metrics.reset()
+        self.addCleanup(metrics.reset)
+        self.directory = tempfile.TemporaryDirectory()
+        self.addCleanup(self.directory.cleanup)
+
+    def test_writes_textfile_and_json_log(self):
+        prometheus_path = os.path.join(self.directory.name, 'gpw.prom')
+        log_path = os.path.join(self.directory.name, 'metrics.log')
+        metrics.increment('rows_stored', 410)
+
+        log_event('fetch', path=log_path, date='2024-02-23', rows=410)
+        write_metrics(prometheus_path, log_path)
+
+        with open(prometheus_path, encoding='utf-8') as prometheus_file:
+            self.assertIn('gpw_rows_stored_total 410', prometheus_file.read())
+        with open(log_path, encoding='utf-8') as log_file:
+            events = [json.loads(line) for line in log_file]
+        self.assertEqual([event['event'] for event in events], ['fetch', 'run'])
+        self.assertEqual(events[1]['counters'], {'rows_stored': 410})
+        self.assertFalse(os.path.exists(prometheus_path + '.tmp'))
+
+    @patch.dict(os.environ)
+    def test_log_is_off_without_a_path(self):
+        os.environ.pop('METRICS_LOG', None)
+        log_event('fetch', rows=410)
+        self.assertEqual(os.listdir(self.directory.name), [])
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,69 @@
+import unittest
+from datetime import date
+
+from sqlalchemy import create_engine, inspect, text
+
+from migrate_tables import legacy_tables, migrate
+from models import Quote
+
+
+def create_legacy_table(connection, table_name, rows):
+    connection.execute(text(
+        f"CREATE TABLE {table_name} (id INTEGER PRIMARY KEY, company_name VARCHAR, value_change FLOAT, "
+        "end_day_value FLOAT, trading_value INTEGER, max_value FLOAT)"
+    ))
+    for row in rows:
+        connection.execute(text(
+            f"INSERT INTO {table_name} (company_name, value_change, end_day_value, trading_value, max_value) "
+            "VALUES (:company_name, :value_change, :end_day_value, :trading_value, :max_value)"
+        ), row)
+
+
+class TestMigrateTables(unittest.TestCase):
+
+    def setUp(self):
+        self.engine = create_engine("sqlite://")
+        self.rows = [
+            {'company_name': '11 bit studios SA', 'value_change': 1.93, 'end_day_value': 580.0, 'trading_value': 2842929, 'max_value': 558.6},
+            {'company_name': '3R Games SA', 'value_change': 3.35, 'end_day_value': 0.28, 'trading_value': 36200, 'max_value': 0.27},
+        ]
+        with self.engine.begin() as connection:
+            create_legacy_table(connection, "stock_data_23_02_2024", self.rows)
+            create_legacy_table(connection, "stock_data_22_02_2024", self.rows + self.rows[:1])
+            connection.execute(text("CREATE TABLE unrelated (id INTEGER PRIMARY KEY)"))
+
+    def tearDown(self):
+        self.engine.dispose()
+
+    def test_finds_only_legacy_tables_in_date_order(self):
+        with self.engine.connect() as connection:
+            self.assertEqual(legacy_tables(connection), [
+                ("stock_data_22_02_2024", date(2024, 2, 22)),
+                ("stock_data_23_02_2024", date(2024, 2, 23)),
+            ])
+
+    def test_imports_rows_with_trade_date(self):
+        migrated = migrate(self.engine)
+
+        self.assertEqual(migrated, {date(2024, 2, 22): 2, date(2024, 2, 23): 2})
+        with self.engine.connect() as connection:
+            stored = connection.execute(
+                text(f"SELECT trade_date, company_name FROM {Quote.__tablename__} ORDER BY trade_date, company_name")
+            ).all()
+        self.assertEqual(len(stored), 4)
+        self.assertEqual(stored[0], ("2024-02-22", "11 bit studios SA"))
+
+    def test_rerun_is_idempotent(self):
+        migrate(self.engine)
+        self.assertEqual(migrate(self.engine), {date(2024, 2, 22): 0, date(2024, 2, 23): 0})
+
+    def test_drop_legacy_tables(self):
+        migrate(self.engine, drop_legacy=True)
+
+        table_names = inspect(self.engine).get_table_names()
+        self.assertNotIn("stock_data_23_02_2024", table_names)
+        self.assertIn(Quote.__tablename__, table_names)
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,95 @@
+import gzip
+import os
+import tempfile
+import unittest
+from datetime import date
+
+from page_cache import PageCache
+
+PAGE_NAME = "NotowaniaGPW.htm"
+TRADE_DATE = date(2024, 2, 23)
+
+
+class TestPageCache(unittest.TestCase):
+
+    def setUp(self):
+        self.directory = tempfile.TemporaryDirectory()
+        self.addCleanup(self.directory.cleanup)
+        with open(PAGE_NAME, encoding='utf-8') as html_file:
+            self.html = html_file.read()
+
+    def test_round_trip(self):
+        cache = PageCache(self.directory.name)
+
+        cache.put(TRADE_DATE, self.html)
+
+        self.assertIn(TRADE_DATE, cache)
+        self.assertEqual(cache.get(TRADE_DATE), self.html)
+        self.assertLess(cache.size(), len(self.html.encode('utf-8')) // 4)
+
+    def test_row_count_is_kept(self):
+        cache = PageCache(self.directory.name)
+        cache.put(TRADE_DATE, self.html, rows=410)
+
+        self.assertEqual(PageCache(self.directory.name).row_count(TRADE_DATE), 410)
+        self.assertIsNone(cache.row_count(date(2024, 2, 22)))
+
+    def test_miss(self):
+        self.assertIsNone(PageCache(self.directory.name).get(TRADE_DATE))
+
+    def test_index_survives_restart(self):
+        PageCache(self.directory.name).put(TRADE_DATE, self.html)
+
+        self.assertEqual(PageCache(self.directory.name).get(TRADE_DATE), self.html)
+
+    def test_reads_do_not_rewrite_the_index(self):
+        cache = PageCache(self.directory.name)
+        cache.put(TRADE_DATE, self.html)
+        index_path = os.path.join(self.directory.name, PageCache.INDEX_NAME)
+        with open(index_path, encoding='utf-8') as index_file:
+            index = index_file.read()
+
+        cache.get(TRADE_DATE)
+
+        with open(index_path, encoding='utf-8') as index_file:
+            self.assertEqual(index_file.read(), index)
+
+    def test_caches_sharing_a_directory_keep_each_others_pages(self):
+        first = PageCache(self.directory.name)
+        second = PageCache(self.directory.name)
+
+        first.put(date(2024, 2, 22), self.html)
+        second.put(TRADE_DATE, self.html)
+
+        self.assertEqual(second.get(date(2024, 2, 22)), self.html)
+        restarted = PageCache(self.directory.name)
+        self.assertIn(date(2024, 2, 22), restarted)
+        self.assertIn(TRADE_DATE, restarted)
+
+    def test_corrupt_page_is_dropped(self):
+        cache = PageCache(self.directory.name)
+        cache.put(TRADE_DATE, self.html)
+        with gzip.open(os.path.join(self.directory.name, "2024-02-23.html.gz"), 'wb') as page_file:
+            page_file.write(b"<html>truncated")
+
+        self.assertIsNone(cache.get(TRADE_DATE))
+        self.assertNotIn(TRADE_DATE, cache)
+
+    def test_evicts_least_recently_read_pages(self):
+        cache = PageCache(self.directory.name)
+        cache.put(date(2024, 2, 21), self.html)
+        page_size = cache.size()
+        cache.max_bytes = page_size * 2 + 100
+        cache.put(date(2024, 2, 22), self.html + " ")
+        cache.get(date(2024, 2, 21))
+
+        cache.put(date(2024, 2, 23), self.html + "  ")
+
+        self.assertIn(date(2024, 2, 21), cache)
+        self.assertNotIn(date(2024, 2, 22), cache)
+        self.assertIn(date(2024, 2, 23), cache)
+        self.assertFalse(os.path.exists(os.path.join(self.directory.name, "2024-02-22.html.gz")))
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,64 @@
+import unittest
+from page_parser import (VALUE_ADJUSTMENT, extract_table_cells, normalize_row, parse_quotes_file,
+                         parse_quotes_html, parse_quotes_page, replace_decimal_separator)
+
+PAGE_NAME = "NotowaniaGPW.htm"
+
+
+class TestReplaceDecimalSeparator(unittest.TestCase):
+
+    def test_comma_separator(self):
+        self.assertEqual(replace_decimal_separator("580,00"), 580.0)
+
+    def test_thousands_separators(self):
+        self.assertEqual(replace_decimal_separator("2 842 929"), 2842929.0)
+        self.assertEqual(replace_decimal_separator("2\xa0842\xa0929"), 2842929.0)
+
+    def test_signed_value(self):
+        self.assertEqual(replace_decimal_separator("+1,93"), 1.93)
+        self.assertEqual(replace_decimal_separator("-0,50"), -0.5)
+
+    def test_missing_value(self):
+        self.assertEqual(replace_decimal_separator("—"), 0)
+
+
+class TestParseQuotesHtml(unittest.TestCase):
+
+    @classmethod
+    def setUpClass(cls):
+        cls.rows = parse_quotes_file(PAGE_NAME)
+
+    def test_parses_every_row(self):
+        self.assertEqual(len(self.rows), 410)
+
+    def test_first_row(self):
+        self.assertEqual(self.rows[0], {
+            'company_name': '11 bit studios SA',
+            'value_change': 1.93,
+            'end_day_value': 580.0,
+            'trading_value': 2842929.0,
+            'max_value': round(588.0 * VALUE_ADJUSTMENT, 2),
+        })
+
+    def test_last_row(self):
+        self.assertEqual(self.rows[-1]['company_name'], 'ZUK Stąporków SA')
+        self.assertEqual(self.rows[-1]['end_day_value'], 3.19)
+
+    def test_matches_normalize_row(self):
+        with open(PAGE_NAME, encoding='utf-8') as html_file:
+            cells = extract_table_cells(html_file.read())[0]
+        self.assertEqual(normalize_row([cells[0], cells[2], cells[1], cells[7], cells[5]]), self.rows[0])
+
+    def test_page_without_table(self):
+        self.assertEqual(parse_quotes_html("<html><body></body></html>"), [])
+
+    def test_skips_malformed_row(self):
+        html = ('<div class="rt-tbody">'
+                '<div class="rt-tr-group"><div class="rt-tr"><div class="rt-td">Broken SA</div></div></div>'
+                '</div>')
+        self.assertEqual(parse_quotes_html(html), [])
+        self.assertEqual(parse_quotes_page(html), ([], 1))
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,127 @@
+import os
+import tempfile
+import time
+import unittest
+from contextlib import contextmanager
+from datetime import date
+from unittest.mock import patch
+
+from sqlalchemy import create_engine
+from sqlalchemy.orm import scoped_session, sessionmaker
+
+from models import Quote
+from pipeline import DONE, EMPTY, FAILED, FetchPipeline, RateLimiter
+
+ROWS = [
+    {'company_name': '11 bit studios SA', 'value_change': 1.93, 'end_day_value': 580.0, 'trading_value': 2842929, 'max_value': 558.6},
+]
+
+
+def file_engine(test_case):
+    """A SQLite database in a temporary directory. Unlike a shared in-memory
+    connection, every thread of the pipeline gets a connection of its own."""
+    directory = tempfile.TemporaryDirectory()
+    test_case.addCleanup(directory.cleanup)
+    engine = create_engine(f"sqlite:///{os.path.join(directory.name, 'quotes.db')}")
+    test_case.addCleanup(engine.dispose)
+    return engine
+
+
+class FakeRetriever:
+
+    def __init__(self, pages):
+        self.pages = pages
+        self.fetched = []
+
+    def fetch_rows(self, chosen_date):
+        self.fetched.append(chosen_date)
+        page = self.pages[chosen_date]
+        if isinstance(page, Exception):
+            raise page
+        return page
+
+
+class FakePool:
+
+    def __init__(self, retriever, size=1):
+        self.retriever = retriever
+        self.size = size
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, exc_type, exc_value, traceback):
+        pass
+
+    @contextmanager
+    def acquire(self):
+        yield self.retriever
+
+
+class TestRateLimiter(unittest.TestCase):
+
+    def test_spaces_requests_to_the_same_host(self):
+        limiter = RateLimiter(min_interval=0.05)
+        started = time.monotonic()
+
+        for _ in range(3):
+            limiter.wait("https://www.money.pl/gielda/gpw/akcje/?date=2024-02-23")
+
+        self.assertGreaterEqual(time.monotonic() - started, 0.1)
+
+    def test_hosts_are_limited_separately(self):
+        limiter = RateLimiter(min_interval=10)
+        started = time.monotonic()
+
+        limiter.wait("https://www.money.pl/")
+        limiter.wait("https://example.com/")
+
+        self.assertLess(time.monotonic() - started, 1)
+
+
+class TestFetchPipeline(unittest.TestCase):
+
+    def setUp(self):
+        self.Session = scoped_session(sessionmaker(bind=file_engine(self)))
+        self.addCleanup(self.Session.remove)
+        patcher = patch("pipeline.create_database_session", side_effect=self.Session)
+        patcher.start()
+        self.addCleanup(patcher.stop)
+
+    def run_pipeline(self, pages, workers=2):
+        retriever = FakeRetriever(pages)
+        reported = []
+        with patch("pipeline.DriverPool", side_effect=lambda size, rate_limiter, page_cache: FakePool(retriever, size)):
+            pipeline = FetchPipeline(workers=workers, min_interval=0,
+                                     on_result=lambda trade_date, status, *_: reported.append((trade_date, status)))
+            results = pipeline.run([date.fromisoformat(chosen_date) for chosen_date in pages])
+        return retriever, results, reported
+
+    def test_stores_fetched_days(self):
+        retriever, results, reported = self.run_pipeline({
+            "2024-02-21": ROWS,
+            "2024-02-22": [],
+            "2024-02-23": RuntimeError("page did not load"),
+        })
+
+        self.assertEqual({trade_date: result[:2] for trade_date, result in results.items()}, {
+            date(2024, 2, 21): (DONE, 1),
+            date(2024, 2, 22): (EMPTY, 0),
+            date(2024, 2, 23): (FAILED, 0),
+        })
+        self.assertEqual(sorted(reported), sorted((trade_date, result[0]) for trade_date, result in results.items()))
+        self.assertEqual(self.Session().query(Quote).count(), 1)
+
+    def test_skips_days_already_stored(self):
+        self.run_pipeline({"2024-02-21": ROWS}, workers=1)
+        retriever, results, _ = self.run_pipeline({"2024-02-21": ROWS}, workers=1)
+
+        self.assertEqual(retriever.fetched, [])
+        self.assertEqual(results[date(2024, 2, 21)][:2], (DONE, 1))
+
+    def test_no_dates(self):
+        self.assertEqual(FetchPipeline().run([]), {})
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,76 @@
+import unittest
+from datetime import date
+
+import numpy as np
+import pandas as pd
+
+from backtest import build_matrix, evaluate
+from quote_store import QuoteStore
+from screener import QUOTE_FIELDS, screen
+from test_screener import DATES, quotes_frame, screener_rows, stored_session
+
+
+class TestQuoteStore(unittest.TestCase):
+
+    def setUp(self):
+        self.frame = quotes_frame(screener_rows())
+        self.store = QuoteStore.from_frame(self.frame.sample(frac=1, random_state=1))
+
+    def test_company_slices_are_date_ordered(self):
+        self.assertEqual(len(self.store), len(self.frame))
+        self.assertIn('Grower SA', self.store)
+        grower = self.store.company_ids['Grower SA']
+        self.assertEqual(self.store.offsets[grower + 1] - self.store.offsets[grower], 3)
+
+        last = self.store.last('Dip SA', 2)
+        self.assertEqual(list(last['trade_date']), [np.datetime64(DATES[1]), np.datetime64(DATES[2])])
+        self.assertEqual(list(last['value_change']), [-2.0, 3.0])
+        self.assertEqual(len(self.store.last('New Listing SA', 3)['value_change']), 1)
+
+    def test_last_is_a_view(self):
+        self.assertIs(self.store.last('Best SA')['end_day_value'].base, self.store.columns['end_day_value'])
+
+    def test_screen_matches_screener(self):
+        for days in (1, 2, 3, 4):
+            pd.testing.assert_frame_equal(self.store.screen(days=days), screen(self.frame, days=days), check_dtype=False)
+
+    def test_screen_until_earlier_session(self):
+        expected = screen(self.frame[self.frame['trade_date'] <= DATES[1]], days=2)
+
+        pd.testing.assert_frame_equal(self.store.screen(days=2, until=DATES[1]), expected, check_dtype=False)
+
+    def test_empty_store(self):
+        self.assertTrue(QuoteStore.from_frame(quotes_frame([])).screen().empty)
+
+    def test_matrix_matches_backtest(self):
+        matrix, expected = self.store.matrix(), build_matrix(self.frame)
+
+        self.assertEqual(list(matrix.companies), list(expected.companies))
+        self.assertEqual(matrix.trade_dates, list(expected.trade_dates))
+        for field in QUOTE_FIELDS:
+            np.testing.assert_array_equal(matrix.arrays[field], expected.arrays[field])
+        self.assertEqual(evaluate(matrix, days=1), evaluate(expected, days=1))
+
+    def test_add_day(self):
+        next_day = date(2024, 2, 26)
+        self.store.add_day(next_day, [
+            {'company_name': 'Grower SA', 'value_change': 1.0, 'end_day_value': 10.0, 'trading_value': 500000, 'max_value': 9.5},
+            {'company_name': 'Debut SA', 'value_change': 1.0, 'end_day_value': 10.0, 'trading_value': 500000, 'max_value': 9.5},
+        ])
+
+        self.assertIn('Debut SA', self.store)
+        self.assertEqual(self.store.last('Grower SA', 1)['trade_date'][0], np.datetime64(next_day))
+        self.assertEqual(list(self.store.screen(days=4)['company_name']), ['Grower SA'])
+
+    def test_from_database(self):
+        session = stored_session(screener_rows())
+        self.addCleanup(session.close)
+
+        store = QuoteStore.from_database(session, start_date=DATES[1])
+
+        self.assertEqual(list(store.trade_dates), [np.datetime64(DATES[1]), np.datetime64(DATES[2])])
+        pd.testing.assert_frame_equal(store.screen(days=2), self.store.screen(days=2), check_dtype=False)
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,120 @@
+import unittest
+from datetime import date
+
+import pandas as pd
+from sqlalchemy import create_engine
+from sqlalchemy.orm import sessionmaker
+
+from models import Base, Quote
+from formatting import format_hits
+from screener import QUOTE_FIELDS, load_quotes_frame, screen, screen_in_database
+from trading_calendar import get_calendar
+
+DATES = [date(2024, 2, 21), date(2024, 2, 22), date(2024, 2, 23)]
+
+
+def quotes_frame(rows):
+    return pd.DataFrame(rows, columns=['trade_date', 'company_name', *QUOTE_FIELDS])
+
+
+def screener_rows():
+    rows = []
+    for trade_date, change in zip(DATES, [1.0, 2.0, 3.0]):
+        rows.append((trade_date, 'Grower SA', change, 10.0, 500000, 9.5))
+        rows.append((trade_date, 'Illiquid SA', change, 10.0, 1000, 9.5))
+    for trade_date, change in zip(DATES, [1.0, -2.0, 3.0]):
+        rows.append((trade_date, 'Dip SA', change, 10.0, 500000, 9.5))
+    for trade_date, change in zip(DATES, [4.0, 4.0, 4.0]):
+        rows.append((trade_date, 'Below Max SA', change, 10.0, 500000, 11.0))
+    for trade_date, change in zip(DATES, [5.0, 5.0, 5.0]):
+        rows.append((trade_date, 'Best SA', change, 20.0, 800000, 19.0))
+    rows.append((DATES[2], 'New Listing SA', 9.0, 10.0, 500000, 9.5))
+    return rows
+
+
+def stored_session(rows):
+    """An in-memory SQLite session holding `rows`, shaped like screener_rows()."""
+    engine = create_engine("sqlite://")
+    Base.metadata.create_all(engine)
+    session = sessionmaker(bind=engine)()
+    session.add_all(Quote(**dict(zip(['trade_date', 'company_name', *QUOTE_FIELDS], row))) for row in rows)
+    session.commit()
+    return session
+
+
+class TestScreen(unittest.TestCase):
+
+    def setUp(self):
+        self.frame = quotes_frame(screener_rows())
+
+    def test_returns_growers_sorted_by_cumulative_change(self):
+        hits = screen(self.frame, days=3)
+
+        self.assertEqual(list(hits['company_name']), ['Best SA', 'Grower SA'])
+        self.assertEqual(list(hits['all_grow']), [15.0, 6.0])
+        self.assertEqual(list(hits['streak']), [3, 3])
+
+    def test_aligns_companies_by_name_not_position(self):
+        shuffled = self.frame.sample(frac=1, random_state=1)
+        pd.testing.assert_frame_equal(screen(shuffled, days=3), screen(self.frame, days=3))
+
+    def test_window_length_is_configurable(self):
+        hits = screen(self.frame, days=1)
+
+        self.assertIn('New Listing SA', list(hits['company_name']))
+        self.assertIn('Dip SA', list(hits['company_name']))
+        self.assertNotIn('Below Max SA', list(hits['company_name']))
+
+    def test_not_enough_sessions(self):
+        self.assertTrue(screen(self.frame, days=4).empty)
+
+    def test_empty_frame(self):
+        self.assertTrue(screen(quotes_frame([]), days=3).empty)
+
+    def test_format_hits(self):
+        self.assertEqual(format_hits(screen(self.frame, days=3)).splitlines()[0],
+                         f"Think to buy: {'Best SA':26} | {20.0:7}  |  {800000:8}  |  15.0")
+
+
+class TestScreenInDatabase(unittest.TestCase):
+
+    def setUp(self):
+        self.session = stored_session(screener_rows())
+
+    def tearDown(self):
+        self.session.close()
+
+    def test_matches_vectorized_screen(self):
+        frame = load_quotes_frame(self.session, get_calendar().previous_sessions(3, until=DATES[2]))
+        expected = screen(frame, days=3)
+
+        hits = screen_in_database(self.session, days=3, until=DATES[2])
+
+        self.assertEqual(list(hits['company_name']), list(expected['company_name']))
+        self.assertEqual(list(hits['all_grow']), list(expected['all_grow']))
+        self.assertEqual(list(hits['streak']), [3, 3])
+
+    def test_until_limits_the_window(self):
+        hits = screen_in_database(self.session, days=2, until=DATES[1])
+
+        self.assertEqual(list(hits['company_name']), ['Best SA', 'Grower SA'])
+        self.assertEqual(list(hits['all_grow']), [10.0, 3.0])
+
+    def test_window_follows_the_calendar(self):
+        # 2024-02-20 is a session with nothing stored, so no streak can span it.
+        self.assertTrue(screen_in_database(self.session, days=4, until=DATES[2]).empty)
+
+    def test_missing_latest_session_gives_no_hits(self):
+        # The 26th is the next session; screening it must not fall back to the 23rd.
+        self.assertTrue(screen_in_database(self.session, days=3, until=date(2024, 2, 26)).empty)
+
+    def test_missing_middle_session_gives_no_hits(self):
+        self.session.query(Quote).filter(Quote.trade_date == DATES[1]).delete()
+        self.session.commit()
+
+        self.assertTrue(screen_in_database(self.session, days=2, until=DATES[2]).empty)
+        self.assertIn('Best SA', list(screen_in_database(self.session, days=1, until=DATES[2])['company_name']))
+
+
+if __name__ == "__main__":
+    unittest.main()
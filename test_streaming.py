@@ -0,0 +1,90 @@
+import unittest
+from unittest.mock import MagicMock
+
+from screener import QUOTE_FIELDS, screen
+from streaming import Hit, IncrementalScreener, diff_snapshot, stream
+from test_screener import DATES, quotes_frame, screener_rows, stored_session
+
+
+def live_row(company_name, value_change, end_day_value=10.0, trading_value=500000, max_value=9.5):
+    return {'company_name': company_name, 'value_change': value_change, 'end_day_value': end_day_value,
+            'trading_value': trading_value, 'max_value': max_value}
+
+
+class TestIncrementalScreener(unittest.TestCase):
+
+    def setUp(self):
+        # The first two sessions of the screener fixture are history, the
+        # third one arrives live.
+        rows = screener_rows()
+        self.history = quotes_frame([row for row in rows if row[0] != DATES[2]])
+        self.live = [dict(zip(['company_name', *QUOTE_FIELDS], row[1:])) for row in rows if row[0] == DATES[2]]
+        self.screener = IncrementalScreener.from_frame(self.history, days=3)
+
+    def test_live_hits_match_the_daily_screen(self):
+        expected = screen(quotes_frame(screener_rows()), days=3)
+
+        hits = self.screener.update(self.live)
+
+        self.assertEqual([hit.company_name for hit in hits], list(expected['company_name']))
+        self.assertEqual([hit.all_grow for hit in hits], list(expected['all_grow']))
+
+    def test_only_changed_companies_are_reevaluated(self):
+        self.screener.update(self.live)
+        self.screener.evaluate = MagicMock(return_value=None)
+
+        self.screener.update(self.live[:-1] + [live_row('Dip SA', 4.0)])
+
+        self.screener.evaluate.assert_called_once()
+
+    def test_hit_is_reported_once(self):
+        self.screener.update([live_row('Grower SA', -1.0)])
+
+        self.assertEqual(self.screener.update([live_row('Grower SA', 2.0)]), [Hit('Grower SA', 10.0, 500000, 5.0, 3)])
+        self.assertEqual(self.screener.update([live_row('Grower SA', 2.5)]), [])
+        self.assertEqual(self.screener.update([live_row('Grower SA', -1.0)]), [])
+        self.assertEqual(self.screener.update([live_row('Grower SA', 3.0)]), [])
+
+    def test_missing_history_session_leaves_no_prefixes(self):
+        screener = IncrementalScreener.from_frame(self.history[self.history['trade_date'] == DATES[0]], days=3)
+
+        self.assertEqual(screener.prefixes, {})
+        self.assertEqual(screener.update(self.live), [])
+
+    def test_single_day_window_needs_no_history(self):
+        screener = IncrementalScreener.from_frame(quotes_frame([]), days=1)
+
+        self.assertIn('New Listing SA', [hit.company_name for hit in screener.update(self.live)])
+
+    def test_from_database_uses_sessions_before_today(self):
+        session = stored_session(screener_rows())
+        self.addCleanup(session.close)
+
+        screener = IncrementalScreener.from_database(session, days=3, today=DATES[2])
+
+        self.assertEqual(screener.prefixes, {'Grower SA': 3.0, 'Best SA': 10.0, 'Below Max SA': 8.0})
+
+
+class TestStream(unittest.TestCase):
+
+    def test_diff_snapshot(self):
+        previous = {'A': live_row('A', 1.0), 'B': live_row('B', 1.0)}
+
+        changed = diff_snapshot(previous, [live_row('A', 1.0), live_row('B', 2.0), live_row('C', 1.0)])
+
+        self.assertEqual(list(changed), ['B', 'C'])
+
+    def test_polls_and_emits_new_hits(self):
+        retriever = MagicMock()
+        retriever.fetch_rows.side_effect = [[live_row('A', -1.0)], Exception("timeout"), [live_row('A', 1.0)]]
+        on_hits = MagicMock()
+
+        stream(retriever, IncrementalScreener({}, days=1), interval=0, until=None, polls=3, on_hits=on_hits)
+
+        self.assertEqual(retriever.fetch_rows.call_count, 3)
+        self.assertFalse(retriever.fetch_rows.call_args.kwargs['use_cache'])
+        on_hits.assert_called_once_with([Hit('A', 10.0, 500000, 1.0, 1)])
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,67 @@
+import unittest
+from datetime import date
+
+from trading_calendar import TradingCalendar, easter_sunday, gpw_holidays, sessions_in_year
+
+
+class TestHolidays(unittest.TestCase):
+
+    def test_easter_sunday(self):
+        self.assertEqual(easter_sunday(2024), date(2024, 3, 31))
+        self.assertEqual(easter_sunday(2025), date(2025, 4, 20))
+        self.assertEqual(easter_sunday(2019), date(2019, 4, 21))
+
+    def test_movable_holidays(self):
+        holidays = gpw_holidays(2024)
+        self.assertIn(date(2024, 3, 29), holidays)
+        self.assertIn(date(2024, 4, 1), holidays)
+        self.assertIn(date(2024, 5, 30), holidays)
+
+    def test_epiphany_only_since_2011(self):
+        self.assertNotIn(date(2010, 1, 6), gpw_holidays(2010))
+        self.assertIn(date(2011, 1, 6), gpw_holidays(2011))
+
+    def test_sessions_skip_weekends_and_holidays(self):
+        sessions = sessions_in_year(2024)
+        self.assertEqual(len(sessions), 249)
+        self.assertEqual(sessions[0], date(2024, 1, 2))
+        self.assertEqual(sessions[-1], date(2024, 12, 30))
+        self.assertTrue(all(day.weekday() < 5 for day in sessions))
+
+
+class TestTradingCalendar(unittest.TestCase):
+
+    def setUp(self):
+        self.calendar = TradingCalendar(first_year=2023, last_year=2025)
+
+    def test_is_session(self):
+        self.assertTrue(self.calendar.is_session(date(2024, 2, 23)))
+        self.assertFalse(self.calendar.is_session(date(2024, 2, 24)))
+        self.assertFalse(self.calendar.is_session(date(2024, 5, 3)))
+
+    def test_previous_sessions_includes_session_day(self):
+        self.assertEqual(self.calendar.previous_sessions(3, until=date(2024, 2, 23)),
+                         [date(2024, 2, 21), date(2024, 2, 22), date(2024, 2, 23)])
+
+    def test_previous_sessions_across_weekend_and_easter(self):
+        self.assertEqual(self.calendar.previous_sessions(3, until=date(2024, 4, 1)),
+                         [date(2024, 3, 26), date(2024, 3, 27), date(2024, 3, 28)])
+
+    def test_previous_sessions_across_year_end(self):
+        self.assertEqual(self.calendar.previous_sessions(2, until=date(2024, 1, 2)),
+                         [date(2023, 12, 29), date(2024, 1, 2)])
+
+    def test_previous_sessions_before_calendar_start(self):
+        self.assertEqual(self.calendar.previous_sessions(3, until=date(2022, 12, 30)), [])
+        self.assertIsNone(self.calendar.last_session(until=date(2022, 12, 30)))
+
+    def test_last_session(self):
+        self.assertEqual(self.calendar.last_session(until=date(2024, 11, 11)), date(2024, 11, 8))
+
+    def test_sessions_between(self):
+        self.assertEqual(self.calendar.sessions_between(date(2024, 4, 27), date(2024, 5, 6)),
+                         [date(2024, 4, 29), date(2024, 4, 30), date(2024, 5, 2), date(2024, 5, 6)])
+
+
+if __name__ == "__main__":
+    unittest.main()
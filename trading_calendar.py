@@ -0,0 +1,81 @@
+from bisect import bisect_left, bisect_right
+from datetime import date, timedelta
+from functools import lru_cache
+
+FIRST_YEAR = 2000
+
+# (month, day) of the GPW session-free days that fall on the same date
+# every year.
+FIXED_HOLIDAYS = [(1, 1), (5, 1), (5, 3), (8, 15), (11, 1), (11, 11), (12, 24), (12, 25), (12, 26), (12, 31)]
+
+# Epiphany has been a public holiday, and a session-free day, since 2011.
+EPIPHANY_SINCE = 2011
+
+# Good Friday, Easter Monday and Corpus Christi, as offsets from Easter Sunday.
+EASTER_OFFSETS = [-2, 1, 60]
+
+
+def easter_sunday(year):
+    # Anonymous Gregorian algorithm.
+    a = year % 19
+    b, c = divmod(year, 100)
+    d, e = divmod(b, 4)
+    f = (b + 8) // 25
+    g = (b - f + 1) // 3
+    h = (19 * a + b - d - g + 15) % 30
+    i, k = divmod(c, 4)
+    l = (32 + 2 * e + 2 * i - h - k) % 7
+    m = (a + 11 * h + 22 * l) // 451
+    month, day = divmod(h + l - 7 * m + 114, 31)
+    return date(year, month, day + 1)
+
+
+@lru_cache(maxsize=None)
+def gpw_holidays(year):
+    holidays = {date(year, month, day) for month, day in FIXED_HOLIDAYS}
+    if year >= EPIPHANY_SINCE:
+        holidays.add(date(year, 1, 6))
+    easter = easter_sunday(year)
+    holidays.update(easter + timedelta(days=offset) for offset in EASTER_OFFSETS)
+    return frozenset(holidays)
+
+
+@lru_cache(maxsize=None)
+def sessions_in_year(year):
+    holidays = gpw_holidays(year)
+    day = date(year, 1, 1)
+    sessions = []
+    while day.year == year:
+        if day.weekday() < 5 and day not in holidays:
+            sessions.append(day)
+        day += timedelta(days=1)
+    return tuple(sessions)
+
+
+class TradingCalendar:
+    """Precomputed GPW session dates with bisect-based range lookups."""
+
+    def __init__(self, first_year=FIRST_YEAR, last_year=None):
+        last_year = last_year or date.today().year + 1
+        self.sessions = tuple(day for year in range(first_year, last_year + 1) for day in sessions_in_year(year))
+        self._positions = {day: position for position, day in enumerate(self.sessions)}
+
+    def is_session(self, day):
+        return day in self._positions
+
+    def previous_sessions(self, count, until=None):
+        """The last `count` sessions on or before `until` (today by default), oldest first."""
+        end = bisect_right(self.sessions, until or date.today())
+        return list(self.sessions[max(0, end - count):end])
+
+    def last_session(self, until=None):
+        sessions = self.previous_sessions(1, until)
+        return sessions[0] if sessions else None
+
+    def sessions_between(self, start, end):
+        return list(self.sessions[bisect_left(self.sessions, start):bisect_right(self.sessions, end)])
+
+
+@lru_cache(maxsize=None)
+def get_calendar():
+    return TradingCalendar()